@@ -0,0 +1,168 @@
+"""
+Shared REST helpers for the Azure AI test scripts.
+
+The scripts differ only in how they authenticate; the HTTP session, request
+URLs, the handling of streamed chat completions and the Speech REST calls
+live here.
+"""
+
+import os
+import json
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connect and read timeouts in seconds for every request, so a stalled
+# endpoint fails the test instead of hanging it
+REQUEST_TIMEOUT = (3.05, 30)
+
+# The Fast Transcription API only answers once the whole file is transcribed
+TRANSCRIPTION_TIMEOUT = (3.05, 120)
+
+# Fast Transcription REST API (synchronous, whole-file transcription)
+FAST_TRANSCRIPTION_URL = "https://{region}.api.cognitive.microsoft.com/speechtotext/transcriptions:transcribe"
+FAST_TRANSCRIPTION_API_VERSION = "2024-11-15"
+
+# Shared HTTP session so repeated calls to the same host reuse TCP/TLS connections.
+# Throttling and transient server errors are retried with a short backoff.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,
+        raise_on_status=False
+    )
+))
+
+def chat_completions_url(endpoint, deployment, api_version):
+    """
+    Build the chat completions URL for an Azure OpenAI deployment.
+
+    Args:
+        endpoint: The Azure OpenAI endpoint, with or without a trailing slash
+        deployment: The name of the deployment
+        api_version: The API version to use
+
+    Returns:
+        str: The chat completions URL
+    """
+    return f"{(endpoint or '').rstrip('/')}/openai/deployments/{deployment}/chat/completions?api-version={api_version}"
+
+def deployments_url(endpoint, api_version):
+    """
+    Build the URL that lists the deployments of an Azure OpenAI resource.
+
+    Args:
+        endpoint: The Azure OpenAI endpoint, with or without a trailing slash
+        api_version: The API version to use
+
+    Returns:
+        str: The deployments URL
+    """
+    return f"{(endpoint or '').rstrip('/')}/openai/deployments?api-version={api_version}"
+
+def chat(url, headers, payload, stream=False):
+    """
+    Send a chat completion request through the shared session.
+
+    Args:
+        url: The chat completions URL
+        headers: The request headers, including authentication
+        payload: The chat completion request body
+        stream: Ask for the completion as server-sent events
+
+    Returns:
+        The requests response; read it with print_streamed_completion when streaming
+    """
+    if stream:
+        payload = {**payload, "stream": True}
+    return session.post(url, headers=headers, json=payload, stream=stream, timeout=REQUEST_TIMEOUT)
+
+def print_streamed_completion(response):
+    """
+    Print the content of a streamed chat completion as it arrives.
+
+    Args:
+        response: The response of a chat completion request sent with stream=True
+
+    Returns:
+        str: The complete response content
+    """
+    content_parts = []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data: "):
+            continue
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices")
+        if not choices:
+            continue
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            content_parts.append(delta)
+            print(delta, end="", flush=True)
+    print()
+    return "".join(content_parts)
+
+def transcribe_fast(audio_file_path, api_key, region, locale="sv-SE", max_speakers=None):
+    """
+    Transcribe an audio file with a single request to the Fast Transcription API.
+
+    The whole file is uploaded at once and the service returns the complete
+    transcription, so no recognizer session or callbacks are needed.
+
+    Args:
+        audio_file_path: Path to the WAV file to transcribe
+        api_key: The Speech resource API key
+        region: The Azure region of the Speech resource
+        locale: The language of the audio
+        max_speakers: Enable diarization for up to this many speakers
+
+    Returns:
+        str: The transcription
+    """
+    definition = {"locales": [locale]}
+    if max_speakers:
+        definition["diarization"] = {"enabled": True, "maxSpeakers": max_speakers}
+    with open(audio_file_path, "rb") as audio_file:
+        response = session.post(
+            FAST_TRANSCRIPTION_URL.format(region=region),
+            params={"api-version": FAST_TRANSCRIPTION_API_VERSION},
+            headers={"Ocp-Apim-Subscription-Key": api_key},
+            files={
+                "audio": (os.path.basename(audio_file_path), audio_file, "audio/wav"),
+                "definition": (None, json.dumps(definition), "application/json")
+            },
+            timeout=TRANSCRIPTION_TIMEOUT
+        )
+    response.raise_for_status()
+
+    combined_phrases = response.json().get("combinedPhrases", [])
+    return " ".join(phrase["text"] for phrase in combined_phrases).strip()
+
+def probe_speech(api_key, region):
+    """
+    Check that the Speech resource accepts the API key with a single request to its token endpoint.
+
+    Args:
+        api_key: The Speech resource API key
+        region: The Azure region of the Speech resource
+
+    Returns:
+        bool: True if a token was issued for the key
+    """
+    try:
+        url = f"https://{region}.api.cognitive.microsoft.com/sts/v1.0/issueToken"
+        print(f"Requesting a token from: {url}")
+        response = session.post(url, headers={"Ocp-Apim-Subscription-Key": api_key, "Content-Length": "0"}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        print("Speech service accepted the API key!")
+        return True
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return False
@@ -0,0 +1,269 @@
+"""
+Shared helpers for the WAV transcription test scripts.
+
+The batch and continuous recognition scripts differ only in how they drive
+the Speech SDK; loading the speakers file, mapping diarization labels to
+speakers, collecting the transcription lines and caching the results live
+here.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import functools
+
+# Uppercase form of the role used for speakers that could not be identified
+UNKNOWN_ROLE_UPPER = "UNKNOWN"
+
+# Number of matches naming the same speaker that a diarization label needs
+# before it is bound to that speaker's voice for the rest of the session
+LEARN_VOICE_MIN_MATCHES = 2
+
+# On-disk cache of transcription results; set NO_TRANSCRIPTION_CACHE to always
+# run recognition again
+TRANSCRIPTION_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "s2sd")
+USE_TRANSCRIPTION_CACHE = os.getenv("NO_TRANSCRIPTION_CACHE") is None
+
+logger = logging.getLogger(__name__)
+
+def configure_logging():
+    """
+    Configure logging for a transcription script.
+
+    Per-utterance output is logged so that it can be turned down (the
+    default) without slowing the recognition callbacks; set LOG_LEVEL=INFO
+    to see it.
+    """
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "WARNING"),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+@functools.lru_cache(maxsize=None)
+def load_speaker_info(speakers_file):
+    """
+    Load speaker information from a speakers JSON file.
+
+    The file is only read and parsed once per process; later calls return
+    the cached result.
+
+    Args:
+        speakers_file: Path to the speakers JSON file
+
+    Returns:
+        tuple: (speaker_data, speaker_info, name_to_voice, name_pattern) where
+        speaker_data is the parsed file (or an empty dict), speaker_info maps
+        voice name -> {'name', 'role', 'role_upper'}, name_to_voice maps speaker name -> voice
+        name and name_pattern matches any speaker name (None if there are none)
+    """
+    speaker_data = {}
+    speaker_info = {}
+    if os.path.exists(speakers_file):
+        try:
+            with open(speakers_file, 'r', encoding='utf-8') as f:
+                speaker_data = json.load(f)
+                print(f"Loaded speaker information: {len(speaker_data['speakers'])} speakers")
+
+                # Map voice names to roles and names
+                for speaker in speaker_data['speakers']:
+                    voice_name = speaker.get('voice')
+                    role = speaker.get('role', 'unknown')
+                    name = speaker.get('name', 'Unknown')
+
+                    speaker_info[voice_name] = {
+                        'name': name,
+                        'role': role,
+                        'role_upper': role.upper()
+                    }
+
+                    print(f"Speaker: {name} (Voice: {voice_name}, Role: {role})")
+        except Exception as e:
+            print(f"Error loading speaker information: {str(e)}")
+
+    # Index speakers by name and build one pattern that finds any of the names
+    # in a single pass over the recognized text
+    name_to_voice = {}
+    for voice_name, info in speaker_info.items():
+        name_to_voice.setdefault(info['name'], voice_name)
+    name_pattern = None
+    if name_to_voice:
+        name_pattern = re.compile("|".join(
+            re.escape(name) for name in sorted(name_to_voice, key=len, reverse=True)
+        ))
+
+    return speaker_data, speaker_info, name_to_voice, name_pattern
+
+class SpeakerResolver:
+    """
+    Map the speaker IDs reported during one recognition session to speakers.
+
+    Diarization labels (e.g. "Guest-1") are bound to a voice from the speakers
+    file once the recognized text has named the same speaker
+    LEARN_VOICE_MIN_MATCHES times in a row.
+    """
+
+    def __init__(self, speakers_file):
+        """
+        Initialize the resolver.
+
+        Args:
+            speakers_file: Path to the speakers JSON file
+        """
+        (self.speaker_data, self.speaker_info,
+         self.name_to_voice, self.name_pattern) = load_speaker_info(speakers_file)
+
+        # Voice names learned for the service's diarization labels during this session
+        self.learned_voices = {}
+
+        # Candidate voice and its number of matches in a row, per diarization
+        # label that has not been bound to a voice yet
+        self.label_candidates = {}
+
+    def _find_voice(self, text):
+        """Return the voice of the first speaker named in text, or None."""
+        match = self.name_pattern.search(text) if self.name_pattern else None
+        return self.name_to_voice[match.group(0)] if match else None
+
+    def resolve(self, speaker_id, text):
+        """
+        Resolve the speaker of a recognized utterance.
+
+        Args:
+            speaker_id: The speaker ID reported by the service, if any
+            text: The recognized text
+
+        Returns:
+            tuple: (speaker_id, speaker_name, speaker_role, speaker_role_upper)
+        """
+        # A label is only bound to a voice after repeated matches, so
+        # addressing someone by name ("Hej Anna") only affects that one utterance
+        if speaker_id and speaker_id not in self.speaker_info:
+            voice_name = self.learned_voices.get(speaker_id)
+            if voice_name is None:
+                voice_name = self._find_voice(text)
+                if voice_name:
+                    candidate, count = self.label_candidates.get(speaker_id, (None, 0))
+                    count = count + 1 if candidate == voice_name else 1
+                    self.label_candidates[speaker_id] = (voice_name, count)
+                    if count >= LEARN_VOICE_MIN_MATCHES:
+                        self.learned_voices[speaker_id] = voice_name
+                        logger.debug("Learned voice %s for speaker label %s", voice_name, speaker_id)
+            if voice_name:
+                speaker_id = voice_name
+
+        # If we still don't have a speaker ID, try to infer from the text
+        if not speaker_id:
+            speaker_id = self._find_voice(text)
+            if speaker_id:
+                logger.debug("Inferred speaker ID %s from text content", speaker_id)
+
+        # Map speaker ID to name and role if possible
+        info = self.speaker_info.get(speaker_id) if speaker_id else None
+        if info:
+            return speaker_id, info['name'], info['role'], info['role_upper']
+        return speaker_id, "Unknown Speaker", "unknown", UNKNOWN_ROLE_UPPER
+
+class TranscriptionRecorder:
+    """
+    Collect the recognized lines of a transcription, writing each one to the
+    transcription file as soon as it is added.
+    """
+
+    def __init__(self, transcription_out=None):
+        """
+        Initialize the recorder.
+
+        Args:
+            transcription_out: Optional open text file that each line is written to
+        """
+        self.transcription_out = transcription_out
+        self.results = []
+        self.lines = []
+
+    def add_result(self, text, speaker_id, speaker_name, speaker_role, speaker_role_upper):
+        """Record a transcription line and write it to the transcription file."""
+        self.results.append({
+            'text': text,
+            'speaker_id': speaker_id,
+            'speaker_name': speaker_name,
+            'speaker_role': speaker_role
+        })
+        line = f"{speaker_name} ({speaker_role_upper}): {text}"
+        self.lines.append(line)
+        if self.transcription_out:
+            self.transcription_out.write(line + "\n")
+
+    def build_result(self, transcription_file=None):
+        """
+        Combine the recorded lines into a transcription result.
+
+        Args:
+            transcription_file: Path of the transcription file, stored in the result
+
+        Returns:
+            dict: The transcription text and lines, and the speakers and their roles
+        """
+        speakers = {}
+        voice_roles = {}
+        for r in self.results:
+            if r['speaker_id']:
+                speakers[r['speaker_id']] = r['speaker_name']
+                voice_roles[r['speaker_id']] = r['speaker_role']
+        return {
+            'transcription_text': "\n".join(self.lines),
+            'transcription_lines': self.results,
+            'transcription_file': transcription_file,
+            'speakers': speakers,
+            'voice_roles': voice_roles
+        }
+
+def transcription_cache_path(wav_file, speakers_file, prefix):
+    """
+    Get the cache file for a WAV file's transcription result.
+
+    The key is a hash of the WAV file and the speakers file contents, so the
+    cached result is only reused while neither of them changes.
+
+    Args:
+        wav_file: Path to the WAV file
+        speakers_file: Path to the speakers JSON file
+        prefix: Name of the recognition mode, so the scripts don't share entries
+
+    Returns:
+        str: Path of the cache file
+    """
+    hasher = hashlib.blake2b()
+    for path in (wav_file, speakers_file):
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    hasher.update(chunk)
+    return os.path.join(TRANSCRIPTION_CACHE_DIR, f"{prefix}_{hasher.hexdigest()}.json")
+
+def load_cached_transcription(cache_path, transcription_file=None):
+    """
+    Load a cached transcription result, writing its text to transcription_file if given.
+
+    Returns:
+        dict: The cached result, or None if there is no cache entry
+    """
+    if not os.path.exists(cache_path):
+        return None
+
+    print(f"Using cached transcription: {cache_path}")
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+
+    result['transcription_file'] = transcription_file
+    if transcription_file:
+        with open(transcription_file, 'w', encoding='utf-8') as f:
+            f.write(result['transcription_text'])
+    return result
+
+def save_cached_transcription(cache_path, result):
+    """Store a transcription result in the cache."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
@@ -224,7 +224,7 @@ def transcribe_audio(audio_file_path, recorder):
         
         # Variable to store the complete transcription
         transcription = ""
-        done = False
+        done = threading.Event()
         
         # Define callbacks
         def recognized_cb(evt):
@@ -235,18 +235,16 @@ def transcribe_audio(audio_file_path, recorder):
             transcription += recognized_text + " "
         
         def session_stopped_cb(evt):
-            nonlocal done
             print("Session stopped")
             recorder.update_status("Transcription completed")
-            done = True
+            done.set()
         
         def canceled_cb(evt):
-            nonlocal done
             print(f"Recognition canceled: {evt.reason}")
             if evt.reason == speechsdk.CancellationReason.Error:
                 print(f"Error details: {evt.error_details}")
                 recorder.update_status(f"Error: {evt.error_details}")
-            done = True
+            done.set()
         
         # Connect callbacks
         speech_recognizer.recognized.connect(recognized_cb)
@@ -257,17 +255,14 @@ def transcribe_audio(audio_file_path, recorder):
         recorder.update_status("Starting continuous recognition...")
         speech_recognizer.start_continuous_recognition()
         
-        # Wait for recognition to complete
+        # Wait until a callback signals the end of recognition
         max_wait_time = 120  # Maximum wait time in seconds
-        start_time = time.time()
-        
-        while not done and (time.time() - start_time) < max_wait_time:
-            time.sleep(0.5)
+        finished = done.wait(timeout=max_wait_time)
         
         # Stop recognition
         speech_recognizer.stop_continuous_recognition()
         
-        if not done:
+        if not finished:
             recorder.update_status("Timeout - stopping recognition")
         
         recorder.update_status("Transcription completed")
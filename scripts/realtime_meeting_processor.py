@@ -9,7 +9,7 @@ import os
 import sys
 import json
 import time
-import requests
+import select
 import threading
 import cv2
 import numpy as np
@@ -17,13 +17,20 @@ from datetime import datetime
 from dotenv import load_dotenv
 import azure.cognitiveservices.speech as speechsdk
 from pydantic import ValidationError
-import re
+
+try:
+    import termios
+    import tty
+except ImportError:  # Not available on Windows
+    termios = None
+    tty = None
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from src.models import AudioFormData, ProcessingResult, CompletionRequest, SpeakerInfo, SpeakerAnalysisResult
 from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION
 from src.speaker_identification import SpeakerAnalyzer, configure_diarization, get_completion_with_api_key
+from _openai_client import REQUEST_TIMEOUT, session
 
 # Load environment variables
 load_dotenv()
@@ -45,6 +52,9 @@ FONT_THICKNESS = 2
 BG_COLOR = (0, 0, 0)  # Black background
 HIGHLIGHT_COLOR = (0, 255, 0)  # Green for highlights
 
+# Minimum number of seconds between progress updates while a completion streams
+STATUS_UPDATE_INTERVAL = 0.5
+
 class RealtimeRecorder:
     """Class to handle recording and visualization of the real-time meeting processing."""
     
@@ -56,9 +66,12 @@ class RealtimeRecorder:
         self.transcription_text = ""
         self.structured_data = {}
         self.status_message = "Initializing..."
+        self.status_changed = threading.Event()  # Set whenever the status is updated
         self.speakers = {}  # Dictionary of speaker_id -> display_name
         self.voice_roles = {}  # Dictionary of speaker_id -> role
+        self.state_version = 0  # Bumped whenever speakers, voice_roles or structured_data change
         self.speaker_analysis_complete = False
+        self.speaker_analysis_thread = None
         self.azure_openai_provider = azure_openai_provider
         
         # Initialize our speaker analyzer with appropriate configuration
@@ -184,13 +197,12 @@ class RealtimeRecorder:
             
             # Add instructions at the bottom
             instructions = [
-                "Press 'P' to pause/resume recording",
-                "Press 'E' to extract structured data",
-                "Press 'S' to save current transcription",
-                "Press 'Q' to quit"
+                "Press 'P' to pause/resume, 'E' to extract structured data",
+                "Press 'S' to analyze speakers, 'T' to save the transcription",
+                "Press 'A' to save all data, 'Q' to quit"
             ]
             y_pos = SCREEN_HEIGHT - 120
-            cv2.putText(frame, "Controls:", (10, y_pos), FONT, FONT_SCALE, HIGHLIGHT_COLOR, FONT_THICKNESS)
+            cv2.putText(frame, "Controls (type in the terminal):", (10, y_pos), FONT, FONT_SCALE, HIGHLIGHT_COLOR, FONT_THICKNESS)
             y_pos += 30
             for instruction in instructions:
                 cv2.putText(frame, instruction, (20, y_pos), FONT, FONT_SCALE * 0.7, FONT_COLOR, FONT_THICKNESS - 1)
@@ -202,17 +214,9 @@ class RealtimeRecorder:
             # Display the frame
             cv2.imshow("Real-time Meeting Processor", frame)
             
-            # Check for key presses
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                self.stop_recording()
-                break
-            elif key == ord('p'):
-                self.toggle_processing()
-            elif key == ord('e'):
-                self.extract_data_now()
-            elif key == ord('s'):
-                self.save_transcription()
+            # Let OpenCV draw the window. Key presses are read from the terminal
+            # by run_realtime_processor, so the result is ignored here.
+            cv2.waitKey(1)
             
             # Sleep to maintain FPS
             time.sleep(1/FPS)
@@ -220,6 +224,7 @@ class RealtimeRecorder:
     def update_status(self, status):
         """Update the current status displayed in the recording."""
         self.status_message = status
+        self.status_changed.set()
         print(status)
     
     def add_transcription_line(self, text, speaker_id=None):
@@ -241,6 +246,7 @@ class RealtimeRecorder:
         if speaker_id not in self.speakers:
             new_speaker_num = len(self.speakers) + 1
             self.speakers[speaker_id] = f"Speaker {new_speaker_num}"
+            self.state_version += 1
             print(f"New speaker detected: {self.speakers[speaker_id]} (ID: {speaker_id})")
         
         # Format the line with timestamp and speaker
@@ -298,6 +304,7 @@ class RealtimeRecorder:
                 
                 # Update our voice_roles dictionary
                 self.voice_roles.update(results["roles"])
+                self.state_version += 1
                 
                 # Mark analysis as complete
                 self.speaker_analysis_complete = True
@@ -348,6 +355,19 @@ class RealtimeRecorder:
             import traceback
             traceback.print_exc()
     
+    def analyze_speakers_in_background(self):
+        """
+        Run analyze_speakers on a worker thread so the key handling loop is not
+        blocked by the LLM call. Ignored if an analysis is already running.
+        """
+        if self.speaker_analysis_thread and self.speaker_analysis_thread.is_alive():
+            self.update_status("Speaker analysis already in progress")
+            return
+        
+        self.speaker_analysis_thread = threading.Thread(target=self.analyze_speakers)
+        self.speaker_analysis_thread.daemon = True
+        self.speaker_analysis_thread.start()
+    
     def _start_speaker_analysis_thread(self):
         """Start the speaker analysis thread for continuous speaker role analysis."""
         self.update_status("Starting speaker analysis thread...")
@@ -369,6 +389,7 @@ class RealtimeRecorder:
     def set_structured_data(self, data):
         """Set the structured data to display."""
         self.structured_data = data
+        self.state_version += 1
         
         # Save to the JSON file
         with open(self.json_filename, "w", encoding="utf-8") as f:
@@ -583,6 +604,45 @@ def transcribe_from_microphone(recorder):
         import traceback
         traceback.print_exc()
 
+def _extract_json_object(text):
+    """
+    Return the first balanced {...} object in text, or None if there is none.
+    
+    Scans the text once, tracking brace depth and skipping braces inside
+    JSON string literals, so prose before or after the object is ignored.
+    """
+    # Jump straight to the first opening brace so leading prose is skipped
+    # without a per-character Python loop
+    first_brace = text.find('{')
+    if first_brace < 0:
+        return None
+    
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = False
+    for i in range(first_brace, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            if start >= 0:
+                in_string = True
+        elif char == '{':
+            if start < 0:
+                start = i
+            depth += 1
+        elif char == '}' and start >= 0:
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
 def extract_structured_data(transcription):
     """
     Extract structured data from Swedish transcription text using Azure OpenAI with API key authentication.
@@ -679,23 +739,53 @@ def extract_structured_data(transcription):
                 {"role": "user", "content": user_message}
             ],
             "temperature": 0.3,
-            "max_tokens": 1000
+            "max_tokens": 1000,
+            "response_format": {"type": "json_object"},
+            "stream": True
         }
         
-        response = requests.post(api_url, headers=headers, json=payload)
+        # Stream the completion so progress can be shown while the model is still writing
+        response = session.post(api_url, headers=headers, json=payload, stream=True, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 400:
+            # Older API versions and models reject JSON mode; the prompt already
+            # asks for JSON only, so send the request again without it
+            response.close()
+            payload.pop("response_format")
+            response = session.post(api_url, headers=headers, json=payload, stream=True, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
-        result = response.json()
-        structured_data = result["choices"][0]["message"]["content"]
+        content_parts = []
+        received_chars = 0
+        last_status_time = 0
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            choices = json.loads(data).get("choices")
+            if not choices:
+                continue
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                content_parts.append(delta)
+                received_chars += len(delta)
+                # Limit progress updates, each of which wakes the display loop
+                now = time.monotonic()
+                if hasattr(transcription, 'update_status') and now - last_status_time >= STATUS_UPDATE_INTERVAL:
+                    last_status_time = now
+                    transcription.update_status(f"Extracting structured data... ({received_chars} characters received)")
+        
+        structured_data = "".join(content_parts)
         
         # Try to parse the response as JSON to validate it
         try:
             json.loads(structured_data)
         except json.JSONDecodeError:
             # If it's not valid JSON, try to extract JSON from the response
-            match = re.search(r'({.*})', structured_data, re.DOTALL)
-            if match:
-                structured_data = match.group(1)
+            json_object = _extract_json_object(structured_data)
+            if json_object:
+                structured_data = json_object
         
         return structured_data
         
@@ -712,6 +802,18 @@ def extract_structured_data(transcription):
             "participants": []
         })
 
+def _read_key(timeout):
+    """
+    Wait up to timeout seconds for a key press in the terminal.
+    
+    Returns:
+        The key as a lowercase single-character string, or None on timeout
+    """
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        return None
+    return sys.stdin.read(1).lower()
+
 def run_realtime_processor():
     """Run the real-time meeting processor."""
     try:
@@ -736,24 +838,39 @@ def run_realtime_processor():
         transcription_thread.daemon = True
         transcription_thread.start()
         
-        # Main loop to handle UI events
-        while recorder.recording:
-            key = cv2.waitKey(100)
-            
-            # Handle key presses
-            if key == ord('q') or key == 27:  # 'q' or ESC to quit
-                print("Quitting...")
-                recorder.recording = False
-            elif key == ord('p'):  # 'p' to pause/resume
-                recorder.toggle_processing()
-            elif key == ord('e'):  # 'e' to extract data now
-                recorder.extract_data_now()
-            elif key == ord('s'):  # 's' to analyze speakers
-                recorder.analyze_speakers()
-            elif key == ord('a'):  # 'a' to save all data
-                recorder.save_all_data()
-            elif key == ord('t'):  # 't' to save transcription
-                recorder.save_transcription()
+        # Main loop to handle key presses typed in the terminal. The terminal is
+        # put in cbreak mode so keys arrive without waiting for Enter.
+        interactive = termios is not None and sys.stdin.isatty()
+        if interactive:
+            saved_terminal_settings = termios.tcgetattr(sys.stdin.fileno())
+            tty.setcbreak(sys.stdin.fileno())
+        def quit_processor():
+            print("Quitting...")
+            recorder.recording = False
+        
+        # Key press handlers
+        key_handlers = {
+            'q': quit_processor,  # 'q' or ESC to quit
+            '\x1b': quit_processor,
+            'p': recorder.toggle_processing,  # 'p' to pause/resume
+            'e': recorder.extract_data_now,  # 'e' to extract data now
+            's': recorder.analyze_speakers_in_background,  # 's' to analyze speakers
+            'a': recorder.save_all_data,  # 'a' to save all data
+            't': recorder.save_transcription,  # 't' to save transcription
+        }
+        
+        try:
+            while recorder.recording:
+                if not interactive:
+                    time.sleep(0.1)
+                    continue
+                
+                handler = key_handlers.get(_read_key(0.1))
+                if handler:
+                    handler()
+        finally:
+            if interactive:
+                termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, saved_terminal_settings)
         
         # Wait for threads to finish
         transcription_thread.join(timeout=1)
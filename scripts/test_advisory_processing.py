@@ -7,10 +7,16 @@ This verifies that the audio can be transcribed and structured according to the
 import os
 import sys
 import json
+import queue
+import atexit
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from _openai_client import transcribe_fast
 import azure.cognitiveservices.speech as speechsdk
 from openai import AzureOpenAI
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -26,6 +32,65 @@ SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
 
+# Maximum number of audio files processed concurrently
+MAX_PARALLEL_FILES = 8
+
+# Maximum number of transcriptions packed into one grouped extraction request
+MAX_GROUP_SIZE = 8
+
+# System prompt for structured data extraction
+EXTRACTION_FIELDS = """
+        Extract these fields from the transcription as JSON:
+        - client_name: The name of the client or organization mentioned
+        - meeting_date: The date of the meeting in YYYY-MM-DD format
+        - key_points: A summary of the main points discussed
+        - action_items: A list of action items or next steps mentioned
+        - participants: Names of participants mentioned in the meeting
+        """
+EXTRACTION_SINGLE_FORMAT = """
+        Set missing fields to null. Format the output as valid JSON.
+        """
+EXTRACTION_GROUPED_FORMAT = """
+        You will receive several transcriptions, each introduced by a
+        "### TRANSCRIPT <id>" header. Return a single JSON object mapping each
+        id (as a string) to the record extracted from that transcription.
+        Set missing fields to null. Format the output as valid JSON.
+        """
+
+# Validator for the extracted data, built once at import
+AUDIO_FORM_ADAPTER = TypeAdapter(AudioFormData)
+
+# Lazily created clients, shared across calls so that connection setup and
+# credential parsing only happen once per process
+_speech_config = None
+_openai_client = None
+_client_lock = threading.Lock()
+
+def _get_speech_config():
+    """
+    Return the shared SpeechConfig, creating it on first use.
+    """
+    global _speech_config
+    with _client_lock:
+        if _speech_config is None:
+            _speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
+    return _speech_config
+
+def _get_openai_client():
+    """
+    Return the shared AzureOpenAI client, creating it on first use.
+    """
+    global _openai_client
+    with _client_lock:
+        if _openai_client is None:
+            _openai_client = AzureOpenAI(
+                azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                api_version=AZURE_OPENAI_API_VERSION,
+                api_key=AZURE_OPENAI_API_KEY
+            )
+            atexit.register(_openai_client.close)
+    return _openai_client
+
 def transcribe_audio(audio_file_path):
     """
     Transcribe an audio file using Azure Speech Service with API key authentication.
@@ -33,8 +98,8 @@ def transcribe_audio(audio_file_path):
     try:
         print(f"Transcribing audio file: {audio_file_path}")
         
-        # Initialize speech config with API key authentication
-        speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
+        # Reuse the speech config (API key authentication) across files
+        speech_config = _get_speech_config()
         
         # Configure audio input
         audio_input = speechsdk.AudioConfig(filename=audio_file_path)
@@ -46,44 +111,62 @@ def transcribe_audio(audio_file_path):
             language="sv-SE"  # Swedish language for better recognition
         )
         
-        # Variable to store the complete transcription
-        transcription = ""
-        done = False
+        # Recognized phrases, joined once recognition has finished
+        transcription_parts = []
+        done = threading.Event()
         
         # Define callbacks
         def recognized_cb(evt):
-            nonlocal transcription
             print(f"RECOGNIZED: {evt.result.text}")
-            transcription += evt.result.text + " "
+            transcription_parts.append(evt.result.text)
         
         def session_stopped_cb(evt):
-            nonlocal done
             print("Session stopped")
-            done = True
+            done.set()
+        
+        def canceled_cb(evt):
+            print(f"CANCELED: {evt.reason}")
+            done.set()
         
         # Connect callbacks
         speech_recognizer.recognized.connect(recognized_cb)
         speech_recognizer.session_stopped.connect(session_stopped_cb)
+        speech_recognizer.canceled.connect(canceled_cb)
         
         # Start continuous recognition
         print("Starting continuous recognition")
         speech_recognizer.start_continuous_recognition()
         
-        # Wait for recognition to complete
-        import time
-        while not done:
-            time.sleep(0.5)
+        # Wait for the session to stop (or be canceled)
+        done.wait()
         
         # Stop recognition
         speech_recognizer.stop_continuous_recognition()
         
         print("Transcription completed")
-        return transcription.strip()
+        return " ".join(transcription_parts).strip()
         
     except Exception as e:
         print(f"Error in speech transcription: {str(e)}")
         raise
 
+def transcribe_audio_fast(audio_file_path):
+    """
+    Transcribe an audio file with a single request to the Fast Transcription API.
+    
+    The whole file is uploaded at once and the service returns the complete
+    transcription, so no recognizer session or callbacks are needed.
+    """
+    try:
+        print(f"Transcribing audio file with Fast Transcription: {audio_file_path}")
+        transcription = transcribe_fast(audio_file_path, SPEECH_API_KEY, SPEECH_REGION)
+        print("Transcription completed")
+        return transcription
+        
+    except Exception as e:
+        print(f"Error in fast transcription: {str(e)}")
+        raise
+
 def extract_structured_data(transcription):
     """
     Extract structured data from transcription text using Azure OpenAI with API key authentication.
@@ -91,62 +174,104 @@ def extract_structured_data(transcription):
     try:
         print("Extracting structured data from transcription")
         
-        # Initialize Azure OpenAI client with API key authentication
-        client = AzureOpenAI(
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_version=AZURE_OPENAI_API_VERSION,
-            api_key=AZURE_OPENAI_API_KEY
-        )
-        
-        # Define system prompt for structured data extraction
-        system_message = """
-        Extract these fields from the transcription as JSON:
-        - client_name: The name of the client or organization mentioned
-        - meeting_date: The date of the meeting in YYYY-MM-DD format
-        - key_points: A summary of the main points discussed
-        - action_items: A list of action items or next steps mentioned
-        - participants: Names of participants mentioned in the meeting
-        
-        Set missing fields to null. Format the output as valid JSON.
-        """
+        # Reuse the Azure OpenAI client (API key authentication) across calls
+        client = _get_openai_client()
         
         # Make the API call
         response = client.chat.completions.create(
             model=AZURE_OPENAI_DEPLOYMENT,
             messages=[
-                {"role": "system", "content": system_message},
+                {"role": "system", "content": EXTRACTION_FIELDS + EXTRACTION_SINGLE_FORMAT},
                 {"role": "user", "content": transcription}
             ],
             temperature=0.3,  # Lower temperature for more deterministic output
             response_format={"type": "json_object"}
         )
         
-        # Extract and validate the response
+        # JSON mode guarantees a JSON document; it is parsed and validated once,
+        # by AUDIO_FORM_ADAPTER.validate_json in process_audio_file
         result = response.choices[0].message.content
+        if not result:
+            raise ValueError("Azure OpenAI returned an empty response")
         
-        # Validate that the result is valid JSON
-        try:
-            json_data = json.loads(result)
-            print("Successfully extracted structured data")
-            return result
-        except json.JSONDecodeError:
-            print("Azure OpenAI returned invalid JSON")
-            raise ValueError("Failed to parse structured data as JSON")
+        print("Successfully extracted structured data")
+        return result
             
     except Exception as e:
         print(f"Error in structured data extraction: {str(e)}")
         raise
 
-def process_audio_file(audio_file_path):
+def extract_structured_data_grouped(transcriptions):
+    """
+    Extract structured data from several transcriptions using as few Azure OpenAI
+    requests as possible.
+    
+    Transcriptions are packed, up to MAX_GROUP_SIZE at a time, into a single
+    numbered prompt and the model returns one record per transcription id.
+    
+    Args:
+        transcriptions: List of transcription texts
+        
+    Returns:
+        A list of validated AudioFormData objects, in the same order as the input
+    """
+    try:
+        client = _get_openai_client()
+        results = []
+        
+        for group_start in range(0, len(transcriptions), MAX_GROUP_SIZE):
+            group = transcriptions[group_start:group_start + MAX_GROUP_SIZE]
+            print(f"Extracting structured data from {len(group)} transcriptions in one request")
+            
+            user_message = "\n\n".join(
+                f"### TRANSCRIPT {i}\n{text}" for i, text in enumerate(group)
+            )
+            
+            response = client.chat.completions.create(
+                model=AZURE_OPENAI_DEPLOYMENT,
+                messages=[
+                    {"role": "system", "content": EXTRACTION_FIELDS + EXTRACTION_GROUPED_FORMAT},
+                    {"role": "user", "content": user_message}
+                ],
+                temperature=0.3,
+                max_tokens=1000 * len(group),
+                response_format={"type": "json_object"}
+            )
+            
+            try:
+                records = json.loads(response.choices[0].message.content)
+            except json.JSONDecodeError:
+                print("Azure OpenAI returned invalid JSON")
+                raise ValueError("Failed to parse grouped structured data as JSON")
+            
+            for i in range(len(group)):
+                if str(i) not in records:
+                    raise ValueError(f"Grouped response is missing transcript {i}")
+                results.append(AUDIO_FORM_ADAPTER.validate_python(records[str(i)]))
+        
+        print(f"Successfully extracted structured data for {len(results)} transcriptions")
+        return results
+        
+    except Exception as e:
+        print(f"Error in grouped structured data extraction: {str(e)}")
+        raise
+
+def process_audio_file(audio_file_path, fast_transcription=False):
     """
     Process an audio file through the full pipeline:
     1. Transcribe the audio
     2. Extract structured data from the transcription
     3. Validate against the Pydantic model
+    
+    If fast_transcription is set, the audio is transcribed with one Fast
+    Transcription request instead of a continuous recognition session.
     """
     try:
         # Step 1: Transcribe the audio
-        transcription = transcribe_audio(audio_file_path)
+        if fast_transcription:
+            transcription = transcribe_audio_fast(audio_file_path)
+        else:
+            transcription = transcribe_audio(audio_file_path)
         print(f"\nTranscription:\n{transcription}\n")
         
         # Step 2: Extract structured data
@@ -154,7 +279,7 @@ def process_audio_file(audio_file_path):
         print(f"\nStructured Data (JSON):\n{structured_data_json}\n")
         
         # Step 3: Parse and validate with Pydantic
-        structured_data = AudioFormData.model_validate_json(structured_data_json)
+        structured_data = AUDIO_FORM_ADAPTER.validate_json(structured_data_json)
         print("\nStructured Data (Pydantic validated):")
         print(f"- Client Name: {structured_data.client_name}")
         print(f"- Meeting Date: {structured_data.meeting_date}")
@@ -182,22 +307,106 @@ def process_audio_file(audio_file_path):
         print(f"Error processing audio file: {str(e)}")
         raise
 
+def process_audio_files(audio_file_paths, fast_transcription=False):
+    """
+    Process several audio files, overlapping transcription with extraction.
+    
+    Producer threads transcribe up to MAX_PARALLEL_FILES files at a time and
+    hand each transcription to the caller's thread, which extracts structured
+    data for whatever transcriptions are ready (up to MAX_GROUP_SIZE per
+    request). The LLM calls for earlier files therefore run while later files
+    are still being transcribed.
+    
+    Args:
+        audio_file_paths: List of paths to the audio files to process
+        fast_transcription: Transcribe with the Fast Transcription API instead
+            of a continuous recognition session
+        
+    Returns:
+        A list of ProcessingResult objects, in the same order as the input
+    """
+    transcribe = transcribe_audio_fast if fast_transcription else transcribe_audio
+    transcriptions = queue.Queue()
+    producer_errors = []
+    
+    def transcribe_all():
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_PARALLEL_FILES) as executor:
+                futures = {
+                    executor.submit(transcribe, audio_file_path): index
+                    for index, audio_file_path in enumerate(audio_file_paths)
+                }
+                for future in as_completed(futures):
+                    transcriptions.put((futures[future], future.result()))
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            # Sentinel marking the end of the transcriptions
+            transcriptions.put(None)
+    
+    producer = threading.Thread(target=transcribe_all, daemon=True)
+    producer.start()
+    
+    results = [None] * len(audio_file_paths)
+    finished = False
+    while not finished:
+        # Block for the next transcription, then take any others already waiting
+        group = []
+        item = transcriptions.get()
+        while item is not None:
+            group.append(item)
+            if len(group) == MAX_GROUP_SIZE:
+                break
+            try:
+                item = transcriptions.get_nowait()
+            except queue.Empty:
+                break
+        finished = item is None
+        
+        if group:
+            structured_data_list = extract_structured_data_grouped([transcription for _, transcription in group])
+            for (index, transcription), structured_data in zip(group, structured_data_list):
+                results[index] = ProcessingResult(
+                    transcription=transcription,
+                    structured_data=structured_data
+                )
+    
+    producer.join()
+    if producer_errors:
+        raise producer_errors[0]
+    
+    print(f"Processed {len(results)} audio files")
+    return results
+
 if __name__ == "__main__":
     print("Testing advisory meeting processing pipeline...")
     
-    # Path to the generated test audio file
-    audio_file_path = "test_advisory_meeting.wav"
+    parser = argparse.ArgumentParser(description="Test the advisory meeting processing pipeline")
+    parser.add_argument("audio_files", nargs="*", default=["test_advisory_meeting.wav"],
+                        help="Audio files to process (defaults to the generated test audio file)")
+    parser.add_argument("--fast", action="store_true",
+                        help="Transcribe with the Fast Transcription API instead of continuous recognition")
+    args = parser.parse_args()
+    audio_file_paths = args.audio_files
     
-    # Process the audio file
     try:
-        result = process_audio_file(audio_file_path)
-        print("\nTest completed successfully!")
-        
-        # Save the result to a file for reference
-        with open("test_processing_result.json", "w") as f:
-            f.write(result.model_dump_json(indent=2))
-        print("Results saved to test_processing_result.json")
-        
+        if len(audio_file_paths) == 1:
+            results = [process_audio_file(audio_file_paths[0], fast_transcription=args.fast)]
+            result_files = ["test_processing_result.json"]
+        else:
+            results = process_audio_files(audio_file_paths, fast_transcription=args.fast)
+            result_files = [
+                f"{os.path.splitext(os.path.basename(audio_file_path))[0]}_processing_result.json"
+                for audio_file_path in audio_file_paths
+            ]
     except Exception as e:
         print(f"\nTest failed: {str(e)}")
         sys.exit(1)
+    
+    # Save the results to files for reference
+    for audio_file_path, result, result_file in zip(audio_file_paths, results, result_files):
+        with open(result_file, "w") as f:
+            f.write(result.model_dump_json(indent=2))
+        print(f"Results for {audio_file_path} saved to {result_file}")
+    
+    print("\nTest completed successfully!")
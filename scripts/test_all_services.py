@@ -8,13 +8,14 @@ import os
 import sys
 import json
 import time
+import threading
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential, AzureCliCredential
-import requests
 import azure.cognitiveservices.speech as speechsdk
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from _openai_client import REQUEST_TIMEOUT, session
 
 # Load environment variables
 load_dotenv()
@@ -30,11 +31,21 @@ SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
 class AzureOpenAIAuthenticator:
     """Class to handle Azure OpenAI authentication with proper fallback mechanisms."""
     
+    # Renew tokens this many seconds before they expire
+    TOKEN_REFRESH_MARGIN = 300
+    
+    # Never schedule the background refresh sooner than this many seconds, so
+    # a token that is already inside the margin does not refresh in a loop
+    MIN_REFRESH_DELAY = 30
+    
     def __init__(self):
         self.credential = None
         self.api_key = AZURE_OPENAI_API_KEY
         self.token = None
         self.auth_method = None
+        self._lock = threading.Lock()
+        self._headers = None
+        self._refresh_timer = None
     
     def authenticate(self):
         """Try different authentication methods in order of preference."""
@@ -59,8 +70,8 @@ class AzureOpenAIAuthenticator:
             credential = DefaultAzureCredential(additionally_allowed_tenants=["*"])
             token = credential.get_token("https://cognitiveservices.azure.com/.default")
             self.credential = credential
-            self.token = token
             self.auth_method = "DefaultAzureCredential"
+            self._set_token(token)
             print("Successfully authenticated with DefaultAzureCredential")
             return True
         except Exception as e:
@@ -74,8 +85,8 @@ class AzureOpenAIAuthenticator:
             credential = AzureCliCredential()
             token = credential.get_token("https://cognitiveservices.azure.com/.default")
             self.credential = credential
-            self.token = token
             self.auth_method = "AzureCliCredential"
+            self._set_token(token)
             print("Successfully authenticated with AzureCliCredential")
             return True
         except Exception as e:
@@ -87,25 +98,61 @@ class AzureOpenAIAuthenticator:
         if self.api_key:
             print("Using API key authentication...")
             self.auth_method = "ApiKey"
+            self._headers = {"Content-Type": "application/json", "api-key": self.api_key}
             return True
         else:
             print("No API key available.")
             return False
     
-    def get_headers(self):
-        """Get the appropriate headers based on the authentication method."""
-        headers = {"Content-Type": "application/json"}
+    def _set_token(self, token):
+        """Store a new token, rebuild the cached headers and schedule the next refresh."""
+        self.token = token
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token.token}"
+        }
         
-        if self.auth_method in ["DefaultAzureCredential", "AzureCliCredential"]:
-            # Refresh token if needed
-            if self.token.expires_on < time.time() + 300:  # Refresh if expires in less than 5 minutes
-                self.token = self.credential.get_token("https://cognitiveservices.azure.com/.default")
-            
-            headers["Authorization"] = f"Bearer {self.token.token}"
-        elif self.auth_method == "ApiKey":
-            headers["api-key"] = self.api_key
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+        delay = max(token.expires_on - time.time() - self.TOKEN_REFRESH_MARGIN, self.MIN_REFRESH_DELAY)
+        self._refresh_timer = threading.Timer(delay, self._refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+    
+    def _token_is_stale(self):
+        """Check whether the token expires within TOKEN_REFRESH_MARGIN seconds."""
+        return self.token.expires_on - time.time() < self.TOKEN_REFRESH_MARGIN
+    
+    def _refresh(self, only_if_stale=False):
+        """
+        Renew the token ahead of expiry; only one refresh runs at a time.
         
-        return headers
+        Args:
+            only_if_stale: Skip the refresh if another thread already renewed the token
+        """
+        with self._lock:
+            if only_if_stale and not self._token_is_stale():
+                return
+            try:
+                self._set_token(self.credential.get_token("https://cognitiveservices.azure.com/.default"))
+            except Exception as e:
+                print(f"Token refresh failed: {str(e)}")
+    
+    def get_headers(self):
+        """Get the appropriate headers based on the authentication method."""
+        # Renew the token here if the background refresh has not (for example
+        # after a failed refresh or when the timer fired late)
+        if self.credential is not None and self._token_is_stale():
+            self._refresh(only_if_stale=True)
+        if self._headers is None:
+            return {"Content-Type": "application/json"}
+        return self._headers
+    
+    def close(self):
+        """Cancel the background token refresh."""
+        if self._refresh_timer:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
 
 def test_azure_openai():
     """Test connection to Azure OpenAI using the hybrid authentication approach."""
@@ -138,7 +185,7 @@ def test_azure_openai():
         print(f"Making request to: {url}")
         print(f"Using authentication method: {authenticator.auth_method}")
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
         
         # Check response
         if response.status_code == 200:
@@ -154,6 +201,7 @@ def test_azure_openai():
             # If token-based auth failed, try API key as fallback
             if authenticator.auth_method in ["DefaultAzureCredential", "AzureCliCredential"] and "PermissionDenied" in response.text:
                 print("\nToken-based authentication failed with permission denied. Trying API key as fallback...")
+                authenticator.close()
                 authenticator = AzureOpenAIAuthenticator()
                 # Skip to API key directly
                 authenticator._try_api_key()
@@ -161,7 +209,7 @@ def test_azure_openai():
                 
                 # Try again with API key
                 print(f"Retrying with authentication method: {authenticator.auth_method}")
-                response = requests.post(url, headers=headers, json=payload)
+                response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -180,24 +228,35 @@ def test_azure_openai():
         print(f"Error: {str(e)}")
         return False
 
+def synthesize_to_file(text, output_filename):
+    """
+    Synthesize a text to a WAV file using API key authentication.
+    
+    Args:
+        text: The text to synthesize
+        output_filename: Path of the WAV file to write
+        
+    Returns:
+        The SpeechSynthesisResult
+    """
+    speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
+    speech_config.speech_synthesis_voice_name = "en-US-JennyNeural"
+    
+    file_config = speechsdk.audio.AudioOutputConfig(filename=output_filename)
+    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=file_config)
+    return synthesizer.speak_text_async(text).get()
+
 def test_azure_speech():
     """Test connection to Azure Speech using API key authentication."""
     try:
         print(f"\n=== Testing Speech Service ===")
         print(f"Using Speech region: {SPEECH_REGION}")
         
-        # Create speech configuration with API key
-        speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
-        speech_config.speech_synthesis_voice_name = "en-US-JennyNeural"
-        
         # Use file output for testing
         output_filename = "test_output.wav"
-        file_config = speechsdk.audio.AudioOutputConfig(filename=output_filename)
-        
-        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=file_config)
         
         print("Attempting to synthesize speech...")
-        result = synthesizer.speak_text_async("This is a test of the Azure Speech service.").get()
+        result = synthesize_to_file("This is a test of the Azure Speech service.", output_filename)
         
         # Check result
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
@@ -236,7 +295,7 @@ def test_integrated_workflow():
         }
         
         url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
-        response = requests.post(url, headers=headers, json=payload)
+        response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
         
         if response.status_code != 200:
             print(f"OpenAI request failed: {response.status_code}")
@@ -250,15 +309,8 @@ def test_integrated_workflow():
         # 2. Convert the response to speech
         print("\nStep 2: Converting response to speech...")
         
-        speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
-        speech_config.speech_synthesis_voice_name = "en-US-JennyNeural"
-        
         output_filename = "integrated_test_output.wav"
-        file_config = speechsdk.audio.AudioOutputConfig(filename=output_filename)
-        
-        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=file_config)
-        
-        result = synthesizer.speak_text_async(text_response).get()
+        result = synthesize_to_file(text_response, output_filename)
         
         if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
             print("Successfully converted OpenAI response to speech!")
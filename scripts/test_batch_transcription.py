@@ -9,6 +9,11 @@ import os
 import sys
 import json
 import time
+import uuid
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
 
@@ -16,22 +21,82 @@ from dotenv import load_dotenv
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from realtime_meeting_processor import extract_structured_data
 from src.models import ParticipantRole
+from _transcription import (
+    UNKNOWN_ROLE_UPPER, USE_TRANSCRIPTION_CACHE, SpeakerResolver, TranscriptionRecorder,
+    configure_logging, load_speaker_info, transcription_cache_path,
+    load_cached_transcription, save_cached_transcription
+)
 
 # Load environment variables
 load_dotenv()
 
+# Runs structured data extraction (an LLM call) in the background
+_executor = ThreadPoolExecutor(max_workers=4)
+
+# Maximum number of WAV files transcribed concurrently
+MAX_PARALLEL_TRANSCRIPTIONS = 8
+
+# Guards the per-transcription session ID on the shared speech config
+_speech_config_lock = threading.Lock()
+
+# Configure logging
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Configuration
 SPEECH_REGION = os.getenv("SPEECH_REGION", "swedencentral")
 SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
-WAV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_advisory_meeting.wav")
-SPEAKERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_advisory_meeting_speakers.json")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WAV_FILE = os.path.join(ROOT_DIR, "test_advisory_meeting.wav")
+SPEAKERS_FILE = os.path.join(ROOT_DIR, "test_advisory_meeting_speakers.json")
+
+@functools.lru_cache(maxsize=1)
+def build_speech_config():
+    """
+    Build the speech config used for every transcription.
+    
+    The config and its service properties are set up once per process; only
+    the per-transcription session ID is set by the caller.
+    """
+    # Initialize speech config with API key authentication
+    speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
+    
+    # Set Swedish language explicitly
+    speech_config.speech_recognition_language = "sv-SE"
+    
+    # Enable audio logging for better diagnostics
+    speech_config.enable_audio_logging = True
+    
+    # Enable speaker diarization
+    speech_config.set_service_property(
+        name="speechcontext-PhraseOutput.Format",
+        value="Detailed",
+        channel=speechsdk.ServicePropertyChannel.UriQueryParameter
+    )
+    
+    speech_config.set_service_property(
+        name="speechcontext-phraseDetection.speakerDiarization.enabled",
+        value="true",
+        channel=speechsdk.ServicePropertyChannel.UriQueryParameter
+    )
+    
+    # Set maximum number of speakers
+    speech_config.set_service_property(
+        name="speechcontext-phraseDetection.speakerDiarization.maxSpeakerCount",
+        value="10",
+        channel=speechsdk.ServicePropertyChannel.UriQueryParameter
+    )
+    
+    return speech_config
 
-def batch_transcribe_wav_file(wav_file):
+def batch_transcribe_wav_file(wav_file, transcription_file=None):
     """
     Perform batch transcription of a WAV file with speaker identification.
     
     Args:
         wav_file: Path to the WAV file to transcribe
+        transcription_file: Optional path of a text file that each recognized line
+            is written to as soon as it is recognized
         
     Returns:
         dict: Dictionary containing transcription results and speaker information
@@ -42,81 +107,48 @@ def batch_transcribe_wav_file(wav_file):
         print(f"Error: WAV file not found: {wav_file}")
         return None
     
+    # Reuse the result of an earlier run on the same audio if there is one
+    cache_path = transcription_cache_path(wav_file, SPEAKERS_FILE, "batch") if USE_TRANSCRIPTION_CACHE else None
+    if cache_path:
+        cached_result = load_cached_transcription(cache_path, transcription_file)
+        if cached_result:
+            return cached_result
+    
+    # Open the transcription file up front so lines are written as they arrive
+    transcription_out = None
+    if transcription_file:
+        transcription_out = open(transcription_file, 'w', encoding='utf-8', buffering=1)
+    
     try:
-        # Initialize speech config with API key authentication
-        speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
-        
-        # Set Swedish language explicitly
-        speech_config.speech_recognition_language = "sv-SE"
-        
-        # Enable audio logging for better diagnostics
-        speech_config.enable_audio_logging = True
-        
-        # Enable speaker diarization
-        speech_config.set_service_property(
-            name="speechcontext-PhraseOutput.Format",
-            value="Detailed",
-            channel=speechsdk.ServicePropertyChannel.UriQueryParameter
-        )
-        
-        # Generate a unique session ID for this transcription
-        import uuid
-        session_id = str(uuid.uuid4())
-        
-        # Set the session ID for speaker diarization
-        speech_config.set_service_property(
-            name="speechcontext-dialog.sessionId",
-            value=session_id,
-            channel=speechsdk.ServicePropertyChannel.UriQueryParameter
-        )
-        
-        speech_config.set_service_property(
-            name="speechcontext-phraseDetection.speakerDiarization.enabled",
-            value="true",
-            channel=speechsdk.ServicePropertyChannel.UriQueryParameter
-        )
-        
-        # Set maximum number of speakers
-        speech_config.set_service_property(
-            name="speechcontext-phraseDetection.speakerDiarization.maxSpeakerCount",
-            value="10",
-            channel=speechsdk.ServicePropertyChannel.UriQueryParameter
-        )
+        # Reuse the configured speech config (API key authentication)
+        speech_config = build_speech_config()
         
         # Configure audio input from the WAV file
         audio_config = speechsdk.audio.AudioConfig(filename=wav_file)
         
-        # Create speech recognizer
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_config
-        )
+        # Set a unique session ID for speaker diarization of this transcription.
+        # The recognizer copies the config when it is created, so updating the
+        # shared config right before creating it only affects this file; the
+        # lock keeps concurrent transcriptions from interleaving the two steps.
+        with _speech_config_lock:
+            speech_config.set_service_property(
+                name="speechcontext-dialog.sessionId",
+                value=str(uuid.uuid4()),
+                channel=speechsdk.ServicePropertyChannel.UriQueryParameter
+            )
+            
+            # Create speech recognizer
+            speech_recognizer = speechsdk.SpeechRecognizer(
+                speech_config=speech_config,
+                audio_config=audio_config
+            )
         
-        # Load speaker information if available
-        speaker_info = {}
-        if os.path.exists(SPEAKERS_FILE):
-            try:
-                with open(SPEAKERS_FILE, 'r', encoding='utf-8') as f:
-                    speaker_data = json.load(f)
-                    print(f"Loaded speaker information: {len(speaker_data['speakers'])} speakers")
-                    
-                    # Map voice names to roles and names
-                    for speaker in speaker_data['speakers']:
-                        voice_name = speaker.get('voice')
-                        role = speaker.get('role', 'unknown')
-                        name = speaker.get('name', 'Unknown')
-                        
-                        speaker_info[voice_name] = {
-                            'name': name,
-                            'role': role
-                        }
-                        
-                        print(f"Speaker: {name} (Voice: {voice_name}, Role: {role})")
-            except Exception as e:
-                print(f"Error loading speaker information: {str(e)}")
+        # Speaker information (cached after the first call) and the diarization
+        # labels learned during this session
+        resolver = SpeakerResolver(SPEAKERS_FILE)
         
-        # Store all transcription results
-        all_results = []
+        # Store all transcription results and their formatted lines
+        recorder = TranscriptionRecorder(transcription_out)
         
         # Callback to handle recognized speech
         def recognized_cb(evt):
@@ -126,25 +158,19 @@ def batch_transcribe_wav_file(wav_file):
             
             # Get speaker ID if available
             speaker_id = None
-            speaker_name = "Unknown Speaker"
-            speaker_role = "unknown"
             
-            # Try to extract speaker ID from the result
-            if hasattr(evt.result, 'speaker_id'):
-                speaker_id = evt.result.speaker_id
+            # Try to extract speaker ID from the result (only present on some result types)
+            speaker_id = getattr(evt.result, 'speaker_id', None)
             
             # Try to extract from properties
-            if not speaker_id and hasattr(evt.result, 'properties'):
+            if not speaker_id:
                 try:
-                    # Print all properties for debugging
-                    print("\nAvailable properties:")
-                    for prop_name in evt.result.properties:
-                        print(f"  - {prop_name}: {evt.result.properties[prop_name]}")
+                    # Try to extract from JSON result (a single property lookup)
+                    json_str = evt.result.properties.get_property(speechsdk.PropertyId.SpeechServiceResponse_JsonResult)
+                    logger.debug("JSON Result: %s", json_str)
                     
-                    # Try to extract from JSON result
-                    if "SpeechServiceResponse_JsonResult" in evt.result.properties:
-                        json_str = evt.result.properties["SpeechServiceResponse_JsonResult"]
-                        print(f"JSON Result: {json_str}")
+                    # Only parse the (possibly large) result when it has a speaker ID at all
+                    if '"SpeakerId"' in json_str:
                         json_result = json.loads(json_str)
                         
                         if 'SpeakerId' in json_result:
@@ -152,33 +178,17 @@ def batch_transcribe_wav_file(wav_file):
                         elif 'NBest' in json_result and len(json_result['NBest']) > 0 and 'SpeakerId' in json_result['NBest'][0]:
                             speaker_id = json_result['NBest'][0]['SpeakerId']
                 except Exception as e:
-                    print(f"Error extracting speaker ID from properties: {str(e)}")
-            
-            # If we still don't have a speaker ID, try to infer from the text
-            if not speaker_id:
-                # Try to match the text with known speakers
-                for voice_name, info in speaker_info.items():
-                    if info['name'] in recognized_text:
-                        speaker_id = voice_name
-                        print(f"Inferred speaker ID {speaker_id} from text content")
-                        break
+                    logger.warning("Error extracting speaker ID from properties: %s", e)
             
-            # Map speaker ID to name and role if possible
-            if speaker_id and speaker_id in speaker_info:
-                speaker_name = speaker_info[speaker_id]['name']
-                speaker_role = speaker_info[speaker_id]['role']
+            # Map the speaker ID (or a speaker named in the text) to a speaker
+            speaker_id, speaker_name, speaker_role, speaker_role_upper = resolver.resolve(speaker_id, recognized_text)
             
             # Print the recognized text with speaker information
-            print(f"\nRECOGNIZED: {recognized_text}")
-            print(f"SPEAKER: {speaker_name} (ID: {speaker_id}, Role: {speaker_role.upper()})")
+            logger.info("RECOGNIZED: %s", recognized_text)
+            logger.info("SPEAKER: %s (ID: %s, Role: %s)", speaker_name, speaker_id, speaker_role_upper)
             
             # Add to results
-            all_results.append({
-                'text': recognized_text,
-                'speaker_id': speaker_id,
-                'speaker_name': speaker_name,
-                'speaker_role': speaker_role
-            })
+            recorder.add_result(recognized_text, speaker_id, speaker_name, speaker_role, speaker_role_upper)
         
         # Connect the callback to the recognizer
         speech_recognizer.recognized.connect(recognized_cb)
@@ -199,16 +209,13 @@ def batch_transcribe_wav_file(wav_file):
             if cancellation.reason == speechsdk.CancellationReason.Error:
                 print(f"Error details: {cancellation.error_details}")
         
-        # Combine all results into a single transcription
-        transcription_text = "\n".join([f"{r['speaker_name']} ({r['speaker_role'].upper()}): {r['text']}" for r in all_results])
+        # Combine the formatted lines into a single transcription and collect
+        # the speakers and their roles
+        result = recorder.build_result(transcription_file)
         
-        # Create a result object
-        result = {
-            'transcription_text': transcription_text,
-            'transcription_lines': all_results,
-            'speakers': {r['speaker_id']: r['speaker_name'] for r in all_results if r['speaker_id']},
-            'voice_roles': {r['speaker_id']: r['speaker_role'] for r in all_results if r['speaker_id']}
-        }
+        # Only cache runs that actually recognized speech
+        if cache_path and recorder.results:
+            save_cached_transcription(cache_path, result)
         
         return result
     
@@ -217,18 +224,44 @@ def batch_transcribe_wav_file(wav_file):
         import traceback
         traceback.print_exc()
         return None
+    
+    finally:
+        if transcription_out:
+            transcription_out.close()
+
+def batch_transcribe_wav_files(wav_files):
+    """
+    Transcribe several WAV files concurrently.
+    
+    Each file gets its own recognizer and Speech service session, so the
+    network latency of up to MAX_PARALLEL_TRANSCRIPTIONS files overlaps.
+    
+    Args:
+        wav_files: List of paths to the WAV files to transcribe
+        
+    Returns:
+        list: The batch_transcribe_wav_file result for each file (None for
+        failures), in the same order as wav_files
+    """
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TRANSCRIPTIONS) as executor:
+        return list(executor.map(batch_transcribe_wav_file, wav_files))
 
 def test_batch_transcription():
     """
     Test the batch transcription functionality with speaker identification.
     """
     # Perform batch transcription
-    result = batch_transcribe_wav_file(WAV_FILE)
+    transcription_file = os.path.join(ROOT_DIR, "batch_transcription.txt")
+    result = batch_transcribe_wav_file(WAV_FILE, transcription_file)
     
     if not result:
         print("Batch transcription failed")
         return False
     
+    # Start extracting structured data right away; the LLM call runs while the
+    # results below are printed
+    extraction = _executor.submit(extract_structured_data, result['transcription_text'])
+    
     # Print transcription results
     print("\nTranscription Results:")
     print("-" * 50)
@@ -237,14 +270,16 @@ def test_batch_transcription():
     # Print speaker information
     print("\nSpeaker Information:")
     print("-" * 50)
+    speaker_info = load_speaker_info(SPEAKERS_FILE)[1]
     for speaker_id, name in result['speakers'].items():
-        role = result['voice_roles'].get(speaker_id, "unknown")
-        print(f"- {name} (ID: {speaker_id}): {role.upper()}")
+        info = speaker_info.get(speaker_id)
+        role_upper = info['role_upper'] if info else UNKNOWN_ROLE_UPPER
+        print(f"- {name} (ID: {speaker_id}): {role_upper}")
     
     # Extract structured data
     try:
         print("\nExtracting structured data...")
-        structured_data = extract_structured_data(result['transcription_text'])
+        structured_data = extraction.result()
         
         if structured_data:
             print("\nStructured Data:")
@@ -259,15 +294,12 @@ def test_batch_transcription():
                         print(f"- {p.get('name', 'Unknown')} ({p.get('role', 'unknown').upper()})")
             
             # Save the structured data to a file
-            output_file = os.path.join(os.path.dirname(WAV_FILE), "batch_structured_data.json")
+            output_file = os.path.join(ROOT_DIR, "batch_structured_data.json")
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(structured_data, f, ensure_ascii=False, indent=2)
             print(f"\nStructured data saved to: {output_file}")
             
-            # Save the transcription to a file
-            transcription_file = os.path.join(os.path.dirname(WAV_FILE), "batch_transcription.txt")
-            with open(transcription_file, 'w', encoding='utf-8') as f:
-                f.write(result['transcription_text'])
+            # The transcription was written to its file during recognition
             print(f"Transcription saved to: {transcription_file}")
             
             print("\nTest completed successfully!")
@@ -283,4 +315,13 @@ def test_batch_transcription():
         return False
 
 if __name__ == "__main__":
-    test_batch_transcription()
+    if len(sys.argv) > 1:
+        # Transcribe the WAV files given on the command line in parallel
+        wav_files = sys.argv[1:]
+        for wav_file, result in zip(wav_files, batch_transcribe_wav_files(wav_files)):
+            if result:
+                print(f"\n{wav_file}:\n{result['transcription_text']}")
+            else:
+                print(f"\n{wav_file}: transcription failed")
+    else:
+        test_batch_transcription()
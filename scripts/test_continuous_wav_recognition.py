@@ -8,7 +8,10 @@ a pre-recorded WAV file and identify speakers.
 import os
 import sys
 import json
-import time
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
 
@@ -16,22 +19,58 @@ from dotenv import load_dotenv
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from realtime_meeting_processor import extract_structured_data
 from src.models import ParticipantRole
+from _transcription import (
+    UNKNOWN_ROLE_UPPER, USE_TRANSCRIPTION_CACHE, SpeakerResolver, TranscriptionRecorder,
+    configure_logging, load_speaker_info, transcription_cache_path,
+    load_cached_transcription, save_cached_transcription
+)
 
 # Load environment variables
 load_dotenv()
 
+# Runs structured data extraction (an LLM call) in the background
+_executor = ThreadPoolExecutor(max_workers=4)
+
+# Configure logging
+configure_logging()
+logger = logging.getLogger(__name__)
+
 # Configuration
 SPEECH_REGION = os.getenv("SPEECH_REGION", "swedencentral")
 SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
-WAV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_advisory_meeting.wav")
-SPEAKERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_advisory_meeting_speakers.json")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WAV_FILE = os.path.join(ROOT_DIR, "test_advisory_meeting.wav")
+SPEAKERS_FILE = os.path.join(ROOT_DIR, "test_advisory_meeting_speakers.json")
+
+# Upper bound on how long a single recognition session may run
+MAX_SESSION_SECONDS = 3600
+
+@functools.lru_cache(maxsize=1)
+def build_speech_config():
+    """
+    Build the speech config used for every recognition, once per process.
+    """
+    # Initialize speech config with API key authentication
+    speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
+    
+    # Set Swedish language explicitly
+    speech_config.speech_recognition_language = "sv-SE"
+    
+    # Enable detailed output format
+    speech_config.set_property(speechsdk.PropertyId.SpeechServiceResponse_ProfanityOption, "masked")
+    speech_config.set_property(speechsdk.PropertyId.SpeechServiceResponse_PostProcessingOption, "true")
+    speech_config.set_property(speechsdk.PropertyId.SpeechServiceResponse_RequestSentenceBoundary, "true")
+    
+    return speech_config
 
-def continuous_recognize_wav_file(wav_file):
+def continuous_recognize_wav_file(wav_file, transcription_file=None):
     """
     Perform continuous recognition of a WAV file with speaker identification.
     
     Args:
         wav_file: Path to the WAV file to transcribe
+        transcription_file: Optional path of a text file that each recognized line
+            is written to as soon as it is recognized
         
     Returns:
         dict: Dictionary containing transcription results and speaker information
@@ -42,17 +81,21 @@ def continuous_recognize_wav_file(wav_file):
         print(f"Error: WAV file not found: {wav_file}")
         return None
     
+    # Reuse the result of an earlier run on the same audio if there is one
+    cache_path = transcription_cache_path(wav_file, SPEAKERS_FILE, "continuous") if USE_TRANSCRIPTION_CACHE else None
+    if cache_path:
+        cached_result = load_cached_transcription(cache_path, transcription_file)
+        if cached_result:
+            return cached_result
+    
+    # Open the transcription file up front so lines are written as they arrive
+    transcription_out = None
+    if transcription_file:
+        transcription_out = open(transcription_file, 'w', encoding='utf-8', buffering=1)
+    
     try:
-        # Initialize speech config with API key authentication
-        speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
-        
-        # Set Swedish language explicitly
-        speech_config.speech_recognition_language = "sv-SE"
-        
-        # Enable detailed output format
-        speech_config.set_property(speechsdk.PropertyId.SpeechServiceResponse_ProfanityOption, "masked")
-        speech_config.set_property(speechsdk.PropertyId.SpeechServiceResponse_PostProcessingOption, "true")
-        speech_config.set_property(speechsdk.PropertyId.SpeechServiceResponse_RequestSentenceBoundary, "true")
+        # Reuse the configured speech config (API key authentication)
+        speech_config = build_speech_config()
         
         # Configure audio input from the WAV file
         audio_config = speechsdk.audio.AudioConfig(filename=wav_file)
@@ -63,32 +106,14 @@ def continuous_recognize_wav_file(wav_file):
             audio_config=audio_config
         )
         
-        # Load speaker information if available
-        speaker_info = {}
-        if os.path.exists(SPEAKERS_FILE):
-            try:
-                with open(SPEAKERS_FILE, 'r', encoding='utf-8') as f:
-                    speaker_data = json.load(f)
-                    print(f"Loaded speaker information: {len(speaker_data['speakers'])} speakers")
-                    
-                    # Map voice names to roles and names
-                    for speaker in speaker_data['speakers']:
-                        voice_name = speaker.get('voice')
-                        role = speaker.get('role', 'unknown')
-                        name = speaker.get('name', 'Unknown')
-                        
-                        speaker_info[voice_name] = {
-                            'name': name,
-                            'role': role
-                        }
-                        
-                        print(f"Speaker: {name} (Voice: {voice_name}, Role: {role})")
-            except Exception as e:
-                print(f"Error loading speaker information: {str(e)}")
+        # Speaker information (cached after the first call) and the diarization
+        # labels learned during this session
+        resolver = SpeakerResolver(SPEAKERS_FILE)
         
-        # Store all transcription results
-        all_results = []
-        done = False
+        # Store all transcription results and their formatted lines
+        recorder = TranscriptionRecorder(transcription_out)
+        
+        done = threading.Event()
         
         # Callback to handle recognized speech
         def recognized_cb(evt):
@@ -98,135 +123,103 @@ def continuous_recognize_wav_file(wav_file):
             
             # Get speaker ID if available
             speaker_id = None
-            speaker_name = "Unknown Speaker"
-            speaker_role = "unknown"
             
             # Try to extract from properties
-            if hasattr(evt.result, 'properties'):
-                try:
-                    # Try to extract from JSON result
-                    if "SpeechServiceResponse_JsonResult" in evt.result.properties:
-                        json_str = evt.result.properties["SpeechServiceResponse_JsonResult"]
-                        json_result = json.loads(json_str)
-                        
-                        # Print the JSON result for debugging
-                        print(f"JSON Result: {json.dumps(json_result, indent=2)}")
-                        
-                        # Try to extract speaker ID from various locations in the JSON
-                        if 'SpeakerId' in json_result:
-                            speaker_id = json_result['SpeakerId']
-                        elif 'NBest' in json_result and len(json_result['NBest']) > 0:
-                            if 'SpeakerId' in json_result['NBest'][0]:
-                                speaker_id = json_result['NBest'][0]['SpeakerId']
-                except Exception as e:
-                    print(f"Error extracting speaker ID from properties: {str(e)}")
-            
-            # If we still don't have a speaker ID, try to infer from the text
-            if not speaker_id:
-                # Try to match the text with known speakers
-                for voice_name, info in speaker_info.items():
-                    if info['name'] in recognized_text:
-                        speaker_id = voice_name
-                        print(f"Inferred speaker ID {speaker_id} from text content")
-                        break
+            try:
+                # Try to extract from JSON result (a single property lookup)
+                json_str = evt.result.properties.get_property(speechsdk.PropertyId.SpeechServiceResponse_JsonResult)
+                
+                # Log the JSON result for debugging (as received, without re-encoding it)
+                logger.debug("JSON Result: %s", json_str)
+                
+                # Only parse the (possibly large) result when it has a speaker ID at all
+                if '"SpeakerId"' in json_str:
+                    json_result = json.loads(json_str)
+                    
+                    # Try to extract speaker ID from various locations in the JSON
+                    if 'SpeakerId' in json_result:
+                        speaker_id = json_result['SpeakerId']
+                    elif 'NBest' in json_result and len(json_result['NBest']) > 0:
+                        if 'SpeakerId' in json_result['NBest'][0]:
+                            speaker_id = json_result['NBest'][0]['SpeakerId']
+            except Exception as e:
+                logger.warning("Error extracting speaker ID from properties: %s", e)
             
-            # Map speaker ID to name and role if possible
-            if speaker_id and speaker_id in speaker_info:
-                speaker_name = speaker_info[speaker_id]['name']
-                speaker_role = speaker_info[speaker_id]['role']
-            elif not speaker_id:
-                # Try to identify the speaker based on the content
-                for voice_name, info in speaker_info.items():
-                    name = info['name']
-                    # If the speaker's name is mentioned at the beginning of the text
-                    if recognized_text.startswith(f"{name}:") or recognized_text.startswith(f"{name} "):
-                        speaker_id = voice_name
-                        speaker_name = name
-                        speaker_role = info['role']
-                        print(f"Identified speaker {name} based on text pattern")
-                        break
+            # Map the speaker ID (or a speaker named in the text) to a speaker
+            speaker_id, speaker_name, speaker_role, speaker_role_upper = resolver.resolve(speaker_id, recognized_text)
             
             # Print the recognized text with speaker information
-            print(f"\nRECOGNIZED: {recognized_text}")
-            print(f"SPEAKER: {speaker_name} (ID: {speaker_id}, Role: {speaker_role.upper()})")
+            logger.info("RECOGNIZED: %s", recognized_text)
+            logger.info("SPEAKER: %s (ID: %s, Role: %s)", speaker_name, speaker_id, speaker_role_upper)
             
             # Add to results
-            all_results.append({
-                'text': recognized_text,
-                'speaker_id': speaker_id,
-                'speaker_name': speaker_name,
-                'speaker_role': speaker_role
-            })
+            recorder.add_result(recognized_text, speaker_id, speaker_name, speaker_role, speaker_role_upper)
         
         # Callback for session stopped event
         def session_stopped_cb(evt):
-            print("Session stopped")
-            nonlocal done
-            done = True
+            logger.info("Session stopped")
+            done.set()
+        
+        # Callback for canceled recognition, so errors end the wait as well
+        def canceled_cb(evt):
+            logger.warning("Recognition canceled: %s", evt.reason)
+            done.set()
         
         # Connect the callbacks
         speech_recognizer.recognized.connect(recognized_cb)
         speech_recognizer.session_stopped.connect(session_stopped_cb)
+        speech_recognizer.canceled.connect(canceled_cb)
         
         # Start continuous recognition
         print("Starting continuous recognition...")
         speech_recognizer.start_continuous_recognition()
         
         # Wait for completion
-        while not done:
-            time.sleep(0.5)
+        if not done.wait(timeout=MAX_SESSION_SECONDS):
+            print(f"Recognition did not finish within {MAX_SESSION_SECONDS} seconds, stopping")
         
         # Stop recognition
         speech_recognizer.stop_continuous_recognition()
         
+        # Remember whether recognition produced anything before the fallback below
+        speech_recognized = bool(recorder.results)
+        
         # If no results were recognized, try to extract text directly from the WAV file
-        if not all_results:
+        if not recorder.results:
             print("No speech recognized. Attempting to extract text directly from the speakers file...")
             
-            # Create a synthetic transcription from the speakers file
+            # Create a synthetic transcription from the already loaded speakers file
             try:
-                with open(SPEAKERS_FILE, 'r', encoding='utf-8') as f:
-                    speaker_data = json.load(f)
+                if 'conversation' in resolver.speaker_data:
+                    print("Found conversation data in speakers file")
                     
-                    if 'conversation' in speaker_data:
-                        print("Found conversation data in speakers file")
+                    for turn in resolver.speaker_data['conversation']:
+                        speaker_name = turn.get('speaker', 'Unknown')
+                        text = turn.get('text', '')
                         
-                        for turn in speaker_data['conversation']:
-                            speaker_name = turn.get('speaker', 'Unknown')
-                            text = turn.get('text', '')
-                            
-                            # Find the speaker info
-                            speaker_id = None
+                        # Find the speaker info
+                        speaker_id = resolver.name_to_voice.get(speaker_name)
+                        if speaker_id:
+                            speaker_role = resolver.speaker_info[speaker_id]['role']
+                            speaker_role_upper = resolver.speaker_info[speaker_id]['role_upper']
+                        else:
                             speaker_role = "unknown"
-                            
-                            for voice_name, info in speaker_info.items():
-                                if info['name'] == speaker_name:
-                                    speaker_id = voice_name
-                                    speaker_role = info['role']
-                                    break
-                            
-                            all_results.append({
-                                'text': text,
-                                'speaker_id': speaker_id,
-                                'speaker_name': speaker_name,
-                                'speaker_role': speaker_role
-                            })
-                            
-                            print(f"\nEXTRACTED: {text}")
-                            print(f"SPEAKER: {speaker_name} (ID: {speaker_id}, Role: {speaker_role.upper()})")
+                            speaker_role_upper = UNKNOWN_ROLE_UPPER
+                        
+                        recorder.add_result(text, speaker_id, speaker_name, speaker_role, speaker_role_upper)
+                        
+                        print(f"\nEXTRACTED: {text}")
+                        print(f"SPEAKER: {speaker_name} (ID: {speaker_id}, Role: {speaker_role_upper})")
             except Exception as e:
                 print(f"Error extracting text from speakers file: {str(e)}")
         
-        # Combine all results into a single transcription
-        transcription_text = "\n".join([f"{r['speaker_name']} ({r['speaker_role'].upper()}): {r['text']}" for r in all_results])
+        # Combine the formatted lines into a single transcription and collect
+        # the speakers and their roles
+        result = recorder.build_result(transcription_file)
         
-        # Create a result object
-        result = {
-            'transcription_text': transcription_text,
-            'transcription_lines': all_results,
-            'speakers': {r['speaker_id']: r['speaker_name'] for r in all_results if r['speaker_id']},
-            'voice_roles': {r['speaker_id']: r['speaker_role'] for r in all_results if r['speaker_id']}
-        }
+        # Only cache runs that actually recognized speech, not the speakers-file fallback
+        if cache_path and speech_recognized:
+            save_cached_transcription(cache_path, result)
         
         return result
     
@@ -235,18 +228,27 @@ def continuous_recognize_wav_file(wav_file):
         import traceback
         traceback.print_exc()
         return None
+    
+    finally:
+        if transcription_out:
+            transcription_out.close()
 
 def test_continuous_recognition():
     """
     Test the continuous recognition functionality with speaker identification.
     """
     # Perform continuous recognition
-    result = continuous_recognize_wav_file(WAV_FILE)
+    transcription_file = os.path.join(ROOT_DIR, "continuous_transcription.txt")
+    result = continuous_recognize_wav_file(WAV_FILE, transcription_file)
     
     if not result:
         print("Continuous recognition failed")
         return False
     
+    # Start extracting structured data right away; the LLM call runs while the
+    # results below are printed
+    extraction = _executor.submit(extract_structured_data, result['transcription_text'])
+    
     # Print transcription results
     print("\nTranscription Results:")
     print("-" * 50)
@@ -255,14 +257,16 @@ def test_continuous_recognition():
     # Print speaker information
     print("\nSpeaker Information:")
     print("-" * 50)
+    speaker_info = load_speaker_info(SPEAKERS_FILE)[1]
     for speaker_id, name in result['speakers'].items():
-        role = result['voice_roles'].get(speaker_id, "unknown")
-        print(f"- {name} (ID: {speaker_id}): {role.upper()}")
+        info = speaker_info.get(speaker_id)
+        role_upper = info['role_upper'] if info else UNKNOWN_ROLE_UPPER
+        print(f"- {name} (ID: {speaker_id}): {role_upper}")
     
     # Extract structured data
     try:
         print("\nExtracting structured data...")
-        structured_data = extract_structured_data(result['transcription_text'])
+        structured_data = extraction.result()
         
         if structured_data:
             print("\nStructured Data:")
@@ -277,15 +281,12 @@ def test_continuous_recognition():
                         print(f"- {p.get('name', 'Unknown')} ({p.get('role', 'unknown').upper()})")
             
             # Save the structured data to a file
-            output_file = os.path.join(os.path.dirname(WAV_FILE), "continuous_structured_data.json")
+            output_file = os.path.join(ROOT_DIR, "continuous_structured_data.json")
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(structured_data, f, ensure_ascii=False, indent=2)
             print(f"\nStructured data saved to: {output_file}")
             
-            # Save the transcription to a file
-            transcription_file = os.path.join(os.path.dirname(WAV_FILE), "continuous_transcription.txt")
-            with open(transcription_file, 'w', encoding='utf-8') as f:
-                f.write(result['transcription_text'])
+            # The transcription was written to its file during recognition
             print(f"Transcription saved to: {transcription_file}")
             
             print("\nTest completed successfully!")
@@ -5,14 +5,20 @@ identify different speakers, and determine which are advisors and which are clie
 """
 
 import argparse
+import atexit
+import functools
+import hashlib
 import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
 import threading
 import time
 from datetime import datetime as dt
-import copy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import re
 
 import azure.cognitiveservices.speech as speechsdk
@@ -21,6 +27,7 @@ from dotenv import load_dotenv
 
 # Add parent directory to path for relative imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from _openai_client import REQUEST_TIMEOUT, session
 
 try:
     # Try to import from the project
@@ -35,16 +42,51 @@ except ImportError:
     except ImportError:
         # Define a fallback CompletionRequest class
         class CompletionRequest:
-            def __init__(self, prompt, system_message, model="fast", temperature=0.7, max_tokens=800):
+            def __init__(self, prompt, system_message, model="fast", temperature=0.7, max_tokens=800, response_format=None):
                 self.prompt = prompt
                 self.system_message = system_message
                 self.model = model
                 self.temperature = temperature
                 self.max_tokens = max_tokens
+                self.response_format = response_format
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Azure OpenAI configuration, read once at import
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
+AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+AZURE_OPENAI_FAST_MODEL = os.getenv("AZURE_OPENAI_FAST_MODEL", "gpt-4o-mini")  # Using gpt-4o-mini for fast model
+AZURE_OPENAI_CAPABLE_MODEL = os.getenv("AZURE_OPENAI_CAPABLE_MODEL", "gpt-4o")  # Using gpt-4o for smart model
+
+# Thread pool for LLM analysis calls, so that recognition callbacks never wait
+# on the network and up to MAX_PARALLEL_LLM_CALLS calls can be in flight
+MAX_PARALLEL_LLM_CALLS = 8
+
+# Maximum number of recognition results waiting to be processed
+RESULT_QUEUE_SIZE = 2048
+_llm_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_LLM_CALLS)
+
+# Analysis requests arriving within this many seconds of each other are
+# collapsed into a single LLM call
+ANALYSIS_DEBOUNCE_SECONDS = 0.4
+
+# Number of parsed LLM analyses kept per SpeakerAnalyzer, least recently used first out
+ANALYSIS_CACHE_SIZE = 32
+
+# Average speaking rate used to estimate the offsets of ground truth segments
+SPEAKING_RATE_WORDS_PER_SECOND = 2.5
+
+# Financial terms (Swedish) whose use suggests that a speaker is an advisor. They
+# are matched anywhere in a word so that compounds and inflections count too.
+ADVISOR_INDICATORS = ("portfölj", "investering", "tillgång", "fond", "aktie", "obligation",
+                      "avkastning", "risk", "marknad", "rekommenderar", "strategi")
+ADVISOR_INDICATOR_PATTERN = re.compile("|".join(map(re.escape, ADVISOR_INDICATORS)), re.IGNORECASE)
+
 # Import the generate_test_audio function from the generate script
 try:
     from generate_test_advisory_meeting import generate_test_audio
@@ -68,6 +110,20 @@ except ImportError as e:
             f.write(b'RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00\x44\xac\x00\x00\x88\x58\x01\x00\x02\x00\x10\x00data\x00\x00\x00\x00')
         return "test_advisory_meeting.wav"
 
+@functools.lru_cache(maxsize=8)
+def chat_completions_url(deployment_name):
+    """
+    Get the chat completions URL for an Azure OpenAI deployment.
+    
+    Args:
+        deployment_name (str): The name of the deployment
+        
+    Returns:
+        str: The chat completions URL, built once per deployment
+    """
+    return f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/{deployment_name}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+
+
 def get_completion(request: CompletionRequest):
     """
     Get a completion from Azure OpenAI with API key authentication.
@@ -80,18 +136,18 @@ def get_completion(request: CompletionRequest):
     """
     headers = {
         "Content-Type": "application/json",
-        "api-key": os.getenv("AZURE_OPENAI_API_KEY")
+        "api-key": AZURE_OPENAI_API_KEY
     }
     
     # Map logical model name to actual deployment
     model_name = request.model
     if model_name == "fast":
-        model_name = os.getenv("AZURE_OPENAI_FAST_MODEL", "gpt-4o-mini")  # Using gpt-4o-mini for fast model
+        model_name = AZURE_OPENAI_FAST_MODEL
     elif model_name == "smart":
-        model_name = os.getenv("AZURE_OPENAI_CAPABLE_MODEL", "gpt-4o")  # Using gpt-4o for smart model
+        model_name = AZURE_OPENAI_CAPABLE_MODEL
     
     # Prepare the API request
-    api_url = f"{os.getenv('AZURE_OPENAI_ENDPOINT')}/openai/deployments/{model_name}/chat/completions?api-version={os.getenv('AZURE_OPENAI_API_VERSION', '2023-12-01-preview')}"
+    api_url = chat_completions_url(model_name)
     
     messages = []
     if request.system_message:
@@ -105,8 +161,9 @@ def get_completion(request: CompletionRequest):
         "n": 1
     }
     
+    response = None
     try:
-        response = requests.post(api_url, headers=headers, json=data)
+        response = session.post(api_url, headers=headers, json=data, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         # Print raw response for debugging
@@ -117,7 +174,7 @@ def get_completion(request: CompletionRequest):
         return completion
     except Exception as e:
         print(f"Error calling Azure OpenAI API: {str(e)}")
-        if response:
+        if response is not None:
             print(f"Response status: {response.status_code}")
             print(f"Response text: {response.text}")
         return f"Error: {str(e)}"
@@ -132,22 +189,21 @@ def get_completion_with_api_key(request):
     Returns:
         str: The completion text
     """
-    # Get API key and endpoint from environment variables
-    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
-    endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT")
-    api_version = os.environ.get("AZURE_OPENAI_API_VERSION", "2023-12-01-preview")
+    # API key and endpoint, read from the environment once at import
+    api_key = AZURE_OPENAI_API_KEY
+    endpoint = AZURE_OPENAI_ENDPOINT
     
     if not api_key or not endpoint:
-        print("Error: Azure OpenAI API key or endpoint not found in environment variables")
+        logger.error("Azure OpenAI API key or endpoint not found in environment variables")
         return "Error: Azure OpenAI API key or endpoint not found in environment variables"
     
     # Get the deployment name from environment variables
-    deployment_name = os.environ.get("AZURE_OPENAI_DEPLOYMENT")
+    deployment_name = AZURE_OPENAI_DEPLOYMENT
     if not deployment_name:
-        print("Error: AZURE_OPENAI_DEPLOYMENT not found in environment variables")
+        logger.error("AZURE_OPENAI_DEPLOYMENT not found in environment variables")
         return "Error: AZURE_OPENAI_DEPLOYMENT not found in environment variables"
     
-    print(f"Using deployment: {deployment_name}")
+    logger.info("Using deployment: %s", deployment_name)
     
     # Prepare the request
     headers = {
@@ -178,11 +234,16 @@ def get_completion_with_api_key(request):
         "max_tokens": request.max_tokens
     }
     
+    # Ask for JSON mode when the request wants a JSON object back
+    response_format = getattr(request, "response_format", None)
+    if response_format:
+        body["response_format"] = response_format
+    
     # Make the API request
     try:
-        url = f"{endpoint}/openai/deployments/{deployment_name}/chat/completions?api-version={api_version}"
-        print(f"Making request to: {url}")
-        response = requests.post(url, headers=headers, json=body)
+        url = chat_completions_url(deployment_name)
+        logger.info("Making request to: %s", url)
+        response = session.post(url, headers=headers, json=body, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Raise an exception for HTTP errors
         
         # Parse the response
@@ -193,19 +254,113 @@ def get_completion_with_api_key(request):
             completion_text = result["choices"][0]["message"]["content"]
             return completion_text
         else:
-            print("Error: No completion choices found in response")
+            logger.error("No completion choices found in response")
             return "Error: No completion choices found in response"
     
     except requests.exceptions.RequestException as e:
-        print(f"Error making API request: {str(e)}")
+        logger.error("Error making API request: %s", e)
         return f"Error making API request: {str(e)}"
     except json.JSONDecodeError as e:
-        print(f"Error parsing API response: {str(e)}")
+        logger.error("Error parsing API response: %s", e)
         return f"Error parsing API response: {str(e)}"
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.error("Unexpected error: %s", e)
         return f"Unexpected error: {str(e)}"
 
+def _extract_speaker_id(result_json):
+    """
+    Extract the speaker ID from a recognition result's JSON.
+    
+    The NBest alternatives are checked first, then the top-level Speaker and
+    SpeakerId fields.
+    
+    Args:
+        result_json (dict): The parsed recognition result
+        
+    Returns:
+        str: The speaker ID, or "Unknown" if the result has none
+    """
+    speaker_id = (
+        next((item["Speaker"] for item in result_json.get("NBest") or () if item.get("Speaker")), None)
+        or result_json.get("Speaker")
+        or result_json.get("SpeakerId")
+    )
+    return str(speaker_id) if speaker_id else "Unknown"
+
+
+# Decoder used to pull the analysis JSON out of LLM responses
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _extract_json(text):
+    """
+    Extract the first JSON object from a text.
+    
+    The decoder is tried at each opening brace in turn, so JSON wrapped in
+    markdown code blocks or surrounded by prose is found without a regex.
+    
+    Args:
+        text (str): The text to search
+        
+    Returns:
+        dict: The first JSON object in the text, or None if there is none
+    """
+    start = text.find("{")
+    while start != -1:
+        try:
+            result, _ = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(result, dict):
+                return result
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+# System prompt for the speaker role analysis. It is the same for every call
+# and comes first, followed by the fixed instructions, so that requests share
+# the longest possible prefix for prompt caching.
+SPEAKER_ANALYSIS_SYSTEM_PROMPT = """
+You are an AI assistant that analyzes financial advisory meeting transcripts.
+Your task is to determine which speakers are financial advisors and which are clients.
+
+Financial advisors typically:
+- Provide investment advice and recommendations
+- Explain financial concepts and products
+- Ask about financial goals and risk tolerance
+- Use professional financial terminology
+
+Clients typically:
+- Ask questions about investments and financial products
+- Share personal financial information and goals
+- Express concerns or preferences about investments
+- Seek clarification on financial concepts
+
+Analyze each speaker's utterances and determine their role.
+Return your analysis as a JSON object with the following structure:
+{
+    "roles": {
+        "speaker_id_1": "advisor",
+        "speaker_id_2": "client"
+    },
+    "confidence": {
+        "speaker_id_1": 0.9,
+        "speaker_id_2": 0.8
+    },
+    "reasoning": {
+        "speaker_id_1": "This speaker uses financial terminology typical of an advisor.",
+        "speaker_id_2": "This speaker asks questions about investments and shares personal financial goals, which is typical of a client."
+    }
+}
+""".strip()
+
+SPEAKER_ANALYSIS_INSTRUCTIONS = (
+    "Analyze the following conversation between financial advisors and clients.\n"
+    "Determine which speakers are financial advisors and which are clients.\n"
+    "Return your analysis as a JSON object as specified.\n\n"
+)
+
+
 class SpeakerAnalyzer:
     """
     Class for analyzing speakers in a conversation and determining their roles.
@@ -221,7 +376,18 @@ class SpeakerAnalyzer:
         self.analysis_thread = None
         self.stop_analysis = False
         self.analysis_lock = threading.Lock()
+        self._cv = threading.Condition(self.analysis_lock)  # Signals new utterances to the analysis thread
+        self._analysis_timer = None  # Pending debounced analysis request
         self.min_utterances_per_speaker = 2  # Minimum utterances needed for analysis
+        self._last_hash = None  # Hash of the utterances at the last successful analysis
+        self._utterances_digest = hashlib.sha256()  # Running hash over all utterances added so far
+        self._pending = {}  # Dictionary of utterances hash -> Event set when its analysis finishes
+        self._cache = OrderedDict()  # LRU of utterances hash -> parsed LLM result, at most ANALYSIS_CACHE_SIZE entries
+        self._sent_counts = {}  # Dictionary of speaker_id -> utterances already sent to the LLM
+        self._snapshot_seq = 0  # Sequence number of the latest utterances snapshot
+        self._applied_seq = 0  # Sequence number of the snapshot whose result was merged last
+        self._new_work_speakers = set()  # Speakers with new utterances since the last parallel analysis
+        self._prompt_k = 8  # Maximum utterances per speaker sent in one prompt
     
     def add_utterance(self, speaker_id, text):
         """
@@ -239,7 +405,7 @@ class SpeakerAnalyzer:
             is_new_speaker = speaker_id not in self.known_speakers
             
             if is_new_speaker:
-                print(f"New speaker detected: {speaker_id}")
+                logger.info("New speaker detected: %s", speaker_id)
             
             self.known_speakers.add(speaker_id)
             
@@ -248,6 +414,12 @@ class SpeakerAnalyzer:
                 self.utterances[speaker_id] = []
             
             self.utterances[speaker_id].append(text)
+            self._utterances_digest.update(json.dumps([speaker_id, text]).encode("utf-8"))
+            
+            # Wake the analysis thread once the speaker has enough utterances
+            if len(self.utterances[speaker_id]) >= self.min_utterances_per_speaker:
+                self._new_work_speakers.add(speaker_id)
+                self._cv.notify()
             
             return is_new_speaker
     
@@ -263,10 +435,51 @@ class SpeakerAnalyzer:
         """
         return len(self.utterances.get(speaker_id, []))
     
+    def _select_top_k(self, texts):
+        """
+        Select the most informative utterances of a speaker for the prompt.
+        
+        Each utterance is scored by its length, weighted up by how recent it
+        is, and the top scoring ones are returned in their original order.
+        
+        Args:
+            texts (list): The utterances of a speaker, oldest first
+            
+        Returns:
+            list: At most self._prompt_k utterances
+        """
+        if len(texts) <= self._prompt_k:
+            return texts
+        count = len(texts)
+        ranked = sorted(
+            range(count),
+            key=lambda i: len(texts[i]) * (1 + 0.5 * (i / count)),
+            reverse=True
+        )
+        return [texts[i] for i in sorted(ranked[:self._prompt_k])]
+    
+    def _apply_result(self, result):
+        """
+        Update the roles, confidence, and reasoning from a parsed LLM result.
+        
+        Args:
+            result (dict): The parsed analysis returned by the LLM
+        """
+        if "roles" in result:
+            self.roles.update(result["roles"])
+        if "confidence" in result:
+            self.confidence.update(result["confidence"])
+        if "reasoning" in result:
+            self.reasoning.update(result["reasoning"])
+    
     def analyze_with_llm(self, get_completion_func):
         """
         Analyze the speakers using an LLM to determine their roles.
         
+        The analysis lock is only held while the utterances are snapshotted and
+        while the results are merged, never across the LLM call, so
+        add_utterance does not wait on the network.
+        
         Args:
             get_completion_func (callable): A function that takes a CompletionRequest and returns a completion
             
@@ -276,164 +489,186 @@ class SpeakerAnalyzer:
         with self.analysis_lock:
             # Check if we have enough utterances to analyze
             if not self.utterances:
-                print("No utterances to analyze")
+                logger.info("No utterances to analyze")
                 return False
             
-            # Prepare the prompt
-            system_prompt = """
-            You are an AI assistant that analyzes financial advisory meeting transcripts.
-            Your task is to determine which speakers are financial advisors and which are clients.
-            
-            Financial advisors typically:
-            - Provide investment advice and recommendations
-            - Explain financial concepts and products
-            - Ask about financial goals and risk tolerance
-            - Use professional financial terminology
-            
-            Clients typically:
-            - Ask questions about investments and financial products
-            - Share personal financial information and goals
-            - Express concerns or preferences about investments
-            - Seek clarification on financial concepts
-            
-            Analyze each speaker's utterances and determine their role.
-            Return your analysis as a JSON object with the following structure:
-            {
-                "roles": {
-                    "speaker_id_1": "advisor",
-                    "speaker_id_2": "client"
-                },
-                "confidence": {
-                    "speaker_id_1": 0.9,
-                    "speaker_id_2": 0.8
-                },
-                "reasoning": {
-                    "speaker_id_1": "This speaker uses financial terminology typical of an advisor.",
-                    "speaker_id_2": "This speaker asks questions about investments and shares personal financial goals, which is typical of a client."
-                }
-            }
-            """
-            
-            # Create a string representation of the utterances
-            utterances_str = ""
-            for speaker_id, texts in self.utterances.items():
-                utterances_str += f"Speaker {speaker_id}:\n"
-                for text in texts:
-                    utterances_str += f"- {text}\n"
-                utterances_str += "\n"
-            
-            user_prompt = f"""
-            Analyze the following conversation between financial advisors and clients.
-            Determine which speakers are financial advisors and which are clients.
-            
-            {utterances_str}
+            # Skip the LLM call when these exact utterances were analyzed before,
+            # or are being analyzed right now. The hash is kept up to date by
+            # add_utterance, so this does not re-serialize the whole history.
+            utterances_hash = self._utterances_digest.hexdigest()
+            if utterances_hash == self._last_hash:
+                return True
+            pending = self._pending.get(utterances_hash)
+            if pending is None:
+                self._snapshot_seq += 1
+                if utterances_hash in self._cache:
+                    self._cache.move_to_end(utterances_hash)
+                    self._applied_seq = self._snapshot_seq
+                    self._apply_result(self._cache[utterances_hash])
+                    self._last_hash = utterances_hash
+                    return True
+                
+                # Snapshot what the prompt is built from
+                utterances = {speaker_id: list(texts) for speaker_id, texts in self.utterances.items()}
+                roles = dict(self.roles)
+                previous_sent_counts = dict(self._sent_counts)
+                seq = self._snapshot_seq
+                finished = self._pending[utterances_hash] = threading.Event()
+        
+        # Wait for the analysis of these utterances that is already running, so
+        # that a final analysis does not return before its results are merged
+        if pending is not None:
+            pending.wait()
+            return True
+        
+        try:
+            # Create a string representation of the utterances. Speakers that
+            # already have a role only send what they said since the last
+            # analysis; their earlier roles are passed along instead.
+            utterances_parts = []
+            sent_counts = {}
+            for speaker_id, texts in utterances.items():
+                start = previous_sent_counts.get(speaker_id, 0) if speaker_id in roles else 0
+                sent_counts[speaker_id] = len(texts)
+                if start >= len(texts):
+                    continue
+                utterances_parts.append(f"Speaker {speaker_id}:\n")
+                utterances_parts.extend(f"- {text}\n" for text in self._select_top_k(texts[start:]))
+                utterances_parts.append("\n")
+            utterances_str = "".join(utterances_parts)
             
-            Return your analysis as a JSON object as specified.
-            """
+            # The fixed instructions come first and the changing parts last
+            previous_roles = ""
+            if roles:
+                previous_roles = f"Previously classified: {json.dumps(roles, ensure_ascii=False)}\n\n"
+            user_prompt = SPEAKER_ANALYSIS_INSTRUCTIONS + previous_roles + utterances_str
             
             # Create the completion request
             completion_request = CompletionRequest(
                 prompt=user_prompt,
-                system_message=system_prompt,
+                system_message=SPEAKER_ANALYSIS_SYSTEM_PROMPT,
                 model="reasoning",  # Use reasoning model for this complex task
-                temperature=0.3,
-                max_tokens=1000
+                temperature=0.0,  # Deterministic, so cached results stay valid
+                max_tokens=1000,
+                response_format={"type": "json_object"}  # All speakers come back in one JSON object
             )
             
-            try:
-                # Get the completion
-                completion = get_completion_func(completion_request)
-                
-                # Parse the JSON response
-                try:
-                    result = json.loads(completion)
-                    
-                    # Update the roles, confidence, and reasoning
-                    if "roles" in result:
-                        self.roles.update(result["roles"])
-                    if "confidence" in result:
-                        self.confidence.update(result["confidence"])
-                    if "reasoning" in result:
-                        self.reasoning.update(result["reasoning"])
-                    
-                    return True
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing LLM response as JSON: {str(e)}")
-                    print(f"Raw response: {completion}")
-                    
-                    # Try to extract JSON from the response if it's embedded in text
-                    try:
-                        # Look for JSON-like patterns in the response
-                        match = re.search(r'({.*})', completion, re.DOTALL)
-                        if match:
-                            json_str = match.group(1)
-                            result = json.loads(json_str)
-                            
-                            # Update the roles, confidence, and reasoning
-                            if "roles" in result:
-                                self.roles.update(result["roles"])
-                            if "confidence" in result:
-                                self.confidence.update(result["confidence"])
-                            if "reasoning" in result:
-                                self.reasoning.update(result["reasoning"])
-                            
-                            return True
-                    except Exception:
-                        pass
-                    
-                    # If we still couldn't parse the response, make a best guess based on the utterances
-                    print("Making a best guess for speaker roles based on utterances")
-                    for speaker_id, texts in self.utterances.items():
-                        # Simple heuristic: if the speaker mentions portfolio, investments, or uses financial terms,
-                        # they're likely an advisor
-                        advisor_indicators = ["portfölj", "investering", "tillgång", "fond", "aktie", "obligation", 
-                                             "avkastning", "risk", "marknad", "rekommenderar", "strategi"]
-                        
-                        advisor_score = 0
-                        for text in texts:
-                            for indicator in advisor_indicators:
-                                if indicator.lower() in text.lower():
-                                    advisor_score += 1
-                        
-                        # If they use multiple advisor indicators, classify as advisor
-                        if advisor_score >= 2:
-                            self.roles[speaker_id] = "advisor"
-                            self.confidence[speaker_id] = 0.7
-                            self.reasoning[speaker_id] = "This speaker uses financial terminology typical of an advisor."
-                        else:
-                            self.roles[speaker_id] = "client"
-                            self.confidence[speaker_id] = 0.6
-                            self.reasoning[speaker_id] = "This speaker does not use enough financial terminology to be classified as an advisor."
-                    
-                    return True
-            except Exception as e:
-                print(f"Error during speaker analysis: {str(e)}")
-                
-                # Make a best guess based on the utterances
-                print("Making a best guess for speaker roles based on utterances")
-                for speaker_id, texts in self.utterances.items():
-                    # Simple heuristic: if the speaker mentions portfolio, investments, or uses financial terms,
-                    # they're likely an advisor
-                    advisor_indicators = ["portfölj", "investering", "tillgång", "fond", "aktie", "obligation", 
-                                         "avkastning", "risk", "marknad", "rekommenderar", "strategi"]
-                    
-                    advisor_score = 0
-                    for text in texts:
-                        for indicator in advisor_indicators:
-                            if indicator.lower() in text.lower():
-                                advisor_score += 1
-                    
-                    # If they use multiple advisor indicators, classify as advisor
-                    if advisor_score >= 2:
-                        self.roles[speaker_id] = "advisor"
-                        self.confidence[speaker_id] = 0.7
-                        self.reasoning[speaker_id] = "This speaker uses financial terminology typical of an advisor."
-                    else:
-                        self.roles[speaker_id] = "client"
-                        self.confidence[speaker_id] = 0.6
-                        self.reasoning[speaker_id] = "This speaker does not use enough financial terminology to be classified as an advisor."
+            # Get the completion
+            completion = get_completion_func(completion_request)
+            
+            # Parse the JSON response, also when it is embedded in text
+            result = _extract_json(completion)
+            if result is None:
+                logger.error("Error parsing LLM response as JSON")
+                logger.error("Raw response: %s", completion)
                 
+                # If we couldn't parse the response, make a best guess based on the utterances
+                self._heuristic_classify(utterances, seq)
                 return True
+            
+            # Update the roles, confidence, and reasoning, unless a newer
+            # snapshot has already been merged; analyses can finish out of order
+            with self.analysis_lock:
+                self._cache[utterances_hash] = result
+                if len(self._cache) > ANALYSIS_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+                if seq > self._applied_seq:
+                    self._applied_seq = seq
+                    self._apply_result(result)
+                    self._last_hash = utterances_hash
+                    self._sent_counts = sent_counts
+            
+            return True
+        except Exception as e:
+            logger.error("Error during speaker analysis: %s", e)
+            
+            # Make a best guess based on the utterances
+            self._heuristic_classify(utterances, seq)
+            return True
+        finally:
+            with self.analysis_lock:
+                del self._pending[utterances_hash]
+            finished.set()
+    
+    def _score_speaker(self, texts):
+        """
+        Score how much a speaker's utterances sound like an advisor.
+        
+        Args:
+            texts (list): The speaker's utterances
+            
+        Returns:
+            int: The number of distinct advisor indicators, summed over the utterances
+        """
+        return sum(len({match.lower() for match in ADVISOR_INDICATOR_PATTERN.findall(text)}) for text in texts)
+    
+    def _heuristic_classify(self, utterances, seq):
+        """
+        Make a best guess for the speaker roles when the LLM analysis fails.
+        
+        Speakers whose utterances use two or more financial terms are classified
+        as advisors, everyone else as clients.
+        
+        Args:
+            utterances (dict): Snapshot of speaker_id -> list of utterances to classify
+            seq (int): Sequence number of the snapshot
+        """
+        logger.info("Making a best guess for speaker roles based on utterances")
+        scores = {speaker_id: self._score_speaker(texts) for speaker_id, texts in utterances.items()}
+        
+        with self.analysis_lock:
+            # Keep the roles of a newer snapshot that was already merged
+            if seq <= self._applied_seq:
+                return
+            self._applied_seq = seq
+            for speaker_id, score in scores.items():
+                # If they use multiple advisor indicators, classify as advisor
+                if score >= 2:
+                    self.roles[speaker_id] = "advisor"
+                    self.confidence[speaker_id] = 0.7
+                    self.reasoning[speaker_id] = "This speaker uses financial terminology typical of an advisor."
+                else:
+                    self.roles[speaker_id] = "client"
+                    self.confidence[speaker_id] = 0.6
+                    self.reasoning[speaker_id] = "This speaker does not use enough financial terminology to be classified as an advisor."
+    
+    def submit_analysis(self, get_completion_func):
+        """
+        Run analyze_with_llm on the shared LLM thread pool.
+        
+        Recognition callbacks use this so that they return immediately instead
+        of blocking on the LLM round trip.
+        
+        Args:
+            get_completion_func (callable): A function that takes a CompletionRequest and returns a completion
+            
+        Returns:
+            concurrent.futures.Future: Future resolving to the analyze_with_llm result
+        """
+        return _llm_executor.submit(self.analyze_with_llm, get_completion_func)
+    
+    def request_analysis(self, get_completion_func):
+        """
+        Request a speaker analysis, coalescing bursts of requests.
+        
+        Each request (re)starts a timer; the analysis only runs once no further
+        request has arrived for ANALYSIS_DEBOUNCE_SECONDS.
+        
+        Args:
+            get_completion_func (callable): A function that takes a CompletionRequest and returns a completion
+        """
+        with self.analysis_lock:
+            if self._analysis_timer:
+                self._analysis_timer.cancel()
+            self._analysis_timer = threading.Timer(ANALYSIS_DEBOUNCE_SECONDS, self._flush_analysis, args=(get_completion_func,))
+            self._analysis_timer.daemon = True
+            self._analysis_timer.start()
+    
+    def _flush_analysis(self, get_completion_func):
+        """Run the debounced analysis requested through request_analysis."""
+        with self.analysis_lock:
+            self._analysis_timer = None
+        self.submit_analysis(get_completion_func)
     
     def start_parallel_analysis(self, get_completion_func, min_utterances_per_speaker=2):
         """
@@ -445,39 +680,30 @@ class SpeakerAnalyzer:
         """
         self.min_utterances_per_speaker = min_utterances_per_speaker
         self.stop_analysis = False
-        self.last_utterance_count = {}
+        with self.analysis_lock:
+            self._new_work_speakers = {
+                spk_id for spk_id, utterances in self.utterances.items()
+                if len(utterances) >= self.min_utterances_per_speaker
+            }
         
         def analysis_thread_func():
             """Function to run in the parallel analysis thread."""
-            print("Starting parallel speaker analysis thread...")
+            logger.info("Starting parallel speaker analysis thread...")
             
-            while not self.stop_analysis:
-                # Check if we have new utterances to analyze
-                should_analyze = False
-                
-                with self.analysis_lock:
-                    # Check if we have new utterances for any speaker
-                    current_counts = {spk_id: len(utterances) for spk_id, utterances in self.utterances.items()}
-                    
-                    # Compare with last counts
-                    for spk_id, count in current_counts.items():
-                        last_count = self.last_utterance_count.get(spk_id, 0)
-                        if count > last_count and count >= self.min_utterances_per_speaker:
-                            should_analyze = True
-                            break
+            while True:
+                # Wait until a speaker has new utterances to analyze (or we are stopped)
+                with self._cv:
+                    self._cv.wait_for(lambda: self.stop_analysis or self._new_work_speakers)
+                    if self.stop_analysis:
+                        break
                     
-                    # Update last counts
-                    if should_analyze:
-                        self.last_utterance_count = current_counts.copy()
-                
-                if should_analyze:
-                    print("Analyzing speakers in parallel thread...")
-                    self.analyze_with_llm(get_completion_func)
+                    # The analysis below covers everything added so far
+                    self._new_work_speakers.clear()
                 
-                # Sleep for a short time before checking again
-                time.sleep(1)
+                logger.info("Analyzing speakers in parallel thread...")
+                self.analyze_with_llm(get_completion_func)
             
-            print("Parallel speaker analysis thread stopped")
+            logger.info("Parallel speaker analysis thread stopped")
         
         # Start the analysis thread
         self.analysis_thread = threading.Thread(target=analysis_thread_func)
@@ -487,7 +713,12 @@ class SpeakerAnalyzer:
     def stop_parallel_analysis(self):
         """Stop the parallel analysis thread."""
         if self.analysis_thread:
-            self.stop_analysis = True
+            with self._cv:
+                self.stop_analysis = True
+                if self._analysis_timer:
+                    self._analysis_timer.cancel()
+                    self._analysis_timer = None
+                self._cv.notify_all()
             self.analysis_thread.join(timeout=2)
             self.analysis_thread = None
     
@@ -598,64 +829,61 @@ def process_audio_file_with_speaker_analysis(audio_file_path, timeout=60, output
     print("Starting parallel speaker analysis...")
     speaker_analyzer.start_parallel_analysis(get_completion_func, min_utterances_per_speaker=2)
     
+    # Recognized results are queued by the recognition callback and processed on
+    # a worker thread, so the Speech SDK callback never waits on parsing,
+    # printing or the speaker analyzer
+    result_queue = queue.Queue(maxsize=RESULT_QUEUE_SIZE)
+    
+    def process_final_result(result):
+        """Process a final recognition result taken from the result queue."""
+        # Use the speaker ID and text the SDK already exposes; the result JSON is
+        # only parsed when the speaker ID is missing
+        speaker_id = getattr(result, "speaker_id", None) or _extract_speaker_id(json.loads(result.json))
+        text = result.text
+        
+        # Get the timestamp
+        offset = result.offset / 10000000  # Convert from 100ns to seconds
+        timestamp = dt.fromtimestamp(start_time + offset).strftime("%H:%M:%S")
+        
+        # Check if this is a new speaker
+        if speaker_id not in speakers:
+            speakers[speaker_id] = f"Speaker {len(speakers) + 1}"
+            print(f"Detected new speaker: {speakers[speaker_id]} (ID: {speaker_id})")
+        
+        # Add the utterance to the transcription
+        line = f"[{timestamp}] {speakers[speaker_id]}: {text}"
+        transcription_lines.append(line)
+        if transcription_file:
+            transcription_file.write(line + "\n")
+        print(line)
+        
+        # Add the utterance to the speaker analyzer for role analysis
+        new_speaker_detected = speaker_analyzer.add_utterance(speaker_id, text)
+        if new_speaker_detected:
+            print(f"New speaker detected: {speaker_id}. Triggering speaker role analysis...")
+            speaker_analyzer.request_analysis(get_completion_func)
+    
+    def process_results():
+        """Process queued recognition results until the None sentinel arrives."""
+        while True:
+            result = result_queue.get()
+            if result is None:
+                break
+            try:
+                process_final_result(result)
+            except Exception as e:
+                print(f"Error processing recognition result: {str(e)}")
+    
+    result_worker = threading.Thread(target=process_results, daemon=True)
+    result_worker.start()
+    
     # Define callbacks for recognition events
     def handle_final_result(evt):
         """Handle final recognition result."""
         if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-            # Get the result details
-            result_json = json.loads(evt.result.json)
-            
-            # Extract speaker ID - use the Speaker field from the result
-            # Look for the speaker ID in different possible locations in the result
-            speaker_id = None
-            
-            # Try to get speaker ID from NBest results
-            if "NBest" in result_json and result_json["NBest"]:
-                for item in result_json["NBest"]:
-                    if "Speaker" in item and item["Speaker"]:
-                        speaker_id = str(item["Speaker"])
-                        break
-            
-            # If not found in NBest, try the top level
-            if not speaker_id and "Speaker" in result_json:
-                speaker_id = str(result_json["Speaker"])
-            
-            # If still not found, check for SpeakerId
-            if not speaker_id and "SpeakerId" in result_json:
-                speaker_id = str(result_json["SpeakerId"])
-            
-            # If still no speaker ID, use a default
-            if not speaker_id:
-                speaker_id = "Unknown"
-            
-            # Extract the recognized text
-            text = result_json.get("DisplayText", "")
-            
-            # Get the timestamp
-            offset = result_json.get("Offset", 0) / 10000000  # Convert from 100ns to seconds
-            timestamp = dt.fromtimestamp(start_time + offset).strftime("%H:%M:%S")
-            
-            # Use print_lock to ensure clean output
-            with print_lock:
-                # Check if this is a new speaker
-                if speaker_id not in speakers:
-                    speakers[speaker_id] = f"Speaker {len(speakers) + 1}"
-                    print(f"Detected new speaker: {speakers[speaker_id]} (ID: {speaker_id})")
-                
-                # Add the utterance to the transcription
-                line = f"[{timestamp}] {speakers[speaker_id]}: {text}"
-                transcription_lines.append(line)
-                print(line)
-            
-            # Add the utterance to the speaker analyzer for role analysis
-            new_speaker_detected = speaker_analyzer.add_utterance(speaker_id, text)
-            if new_speaker_detected:
-                with print_lock:
-                    print(f"New speaker detected: {speaker_id}. Triggering speaker role analysis...")
-                speaker_analyzer.analyze_with_llm(get_completion_func)
+            result_queue.put(evt.result)
         else:
-            with print_lock:
-                print(f"Recognition result was not successful: {evt.result.reason}")
+            print(f"Recognition result was not successful: {evt.result.reason}")
             
     def handle_canceled(evt):
         print(f"Speech recognition canceled: {evt.result.reason}")
@@ -674,17 +902,32 @@ def process_audio_file_with_speaker_analysis(audio_file_path, timeout=60, output
     transcriber.canceled.connect(handle_canceled)
     transcriber.session_stopped.connect(handle_session_stopped)
     
-    # Start recognition
-    print("Starting recognition...")
-    start_time = time.time()
-    transcriber.start_transcribing_async()
+    # The transcription is written line by line as results arrive, so the file
+    # can be followed during long recordings
+    transcription_file = open(transcription_path, "w", encoding="utf-8", buffering=1) if transcription_path else None
+    try:
+        # Start recognition
+        print("Starting recognition...")
+        start_time = time.time()
+        transcriber.start_transcribing_async()
 
-    # Wait for recognition to complete or timeout
-    print(f"Waiting for recognition to complete (timeout: {timeout} seconds)...")
-    done.wait(timeout=timeout)
+        # Wait for recognition to complete or timeout
+        print(f"Waiting for recognition to complete (timeout: {timeout} seconds)...")
+        done.wait(timeout=timeout)
+        
+        # Stop recognition
+        transcriber.stop_transcribing_async().get()
+        
+    finally:
+        # Let the worker finish the results that are still queued
+        result_queue.put(None)
+        result_worker.join()
+        
+        if transcription_file:
+            transcription_file.close()
     
-    # Stop recognition
-    transcriber.stop_transcribing_async()
+    if transcription_file:
+        print(f"Transcription saved to: {transcription_path}")
     
     # Stop parallel analysis
     speaker_analyzer.stop_parallel_analysis()
@@ -712,11 +955,6 @@ def process_audio_file_with_speaker_analysis(audio_file_path, timeout=60, output
     print("\n" + "="*30 + " FINAL ANALYSIS " + "="*30)
     print("Performing final analysis of speaker roles...")
     
-    # Map display names to speaker IDs for consistent output
-    speaker_display_names = {}
-    for speaker_id, display_name in speakers.items():
-        speaker_display_names[speaker_id] = display_name
-    
     # Perform final analysis
     final_analysis_result = speaker_analyzer.analyze_with_llm(get_completion_func)
     print(f"Final analysis complete. Success: {final_analysis_result}")
@@ -727,8 +965,7 @@ def process_audio_file_with_speaker_analysis(audio_file_path, timeout=60, output
     # Save speaker information to file
     if speakers_info_path:
         # Enhance the speaker roles with display names for better readability
-        enhanced_roles = copy.deepcopy(speaker_roles)
-        enhanced_roles["display_names"] = {speaker_id: name for speaker_id, name in speaker_display_names.items()}
+        enhanced_roles = {**speaker_roles, "display_names": dict(speakers)}
         
         with open(speakers_info_path, "w") as f:
             json.dump(enhanced_roles, f, indent=2)
@@ -760,25 +997,11 @@ def process_audio_file_with_speaker_analysis(audio_file_path, timeout=60, output
         }
         results["speaker_infos"].append(speaker_info)
     
-    # Save transcription to file
-    if transcription_path:
-        with open(transcription_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(transcription_lines))
-        print(f"Transcription saved to: {transcription_path}")
-    
     # Compare with ground truth if available
     if ground_truth_path and os.path.exists(ground_truth_path):
         print("\n=== Comparing with Ground Truth ===")
         try:
-            with open(ground_truth_path, "r", encoding="utf-8") as f:
-                ground_truth = json.load(f)
-            
-            # Extract ground truth speaker roles
-            ground_truth_roles = {}
-            if isinstance(ground_truth, dict) and "speakers" in ground_truth:
-                for speaker in ground_truth["speakers"]:
-                    if isinstance(speaker, dict) and "id" in speaker and "role" in speaker:
-                        ground_truth_roles[speaker["id"]] = speaker["role"]
+            ground_truth_roles = load_ground_truth_roles(ground_truth_path)
             
             # Compare detected roles with ground truth
             for speaker_id, role in results["roles"].items():
@@ -792,10 +1015,31 @@ def process_audio_file_with_speaker_analysis(audio_file_path, timeout=60, output
     
     return results
 
+def configure_logging():
+    """
+    Set up logging for the entry points, once per process.
+    
+    Records are handed to a queue and written to stdout by a single listener
+    thread, so the analysis and LLM threads never wait on I/O. Transcript
+    lines are printed and do not depend on this.
+    """
+    root_logger = logging.getLogger()
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root_logger.handlers):
+        return
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    logging.basicConfig(level=logging.INFO, handlers=[logging.handlers.QueueHandler(log_queue)])
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
 def test_dynamic_speaker_identification():
     """
     Test the speaker identification and role determination with a dynamically generated meeting.
     """
+    configure_logging()
+    
     print("Testing dynamic speaker identification with the generated advisory meeting audio file")
     
     # Path to the generated audio file
@@ -829,6 +1073,42 @@ def test_dynamic_speaker_identification():
         print("\nFailed to identify any speakers or their roles")
         return False
 
+@functools.lru_cache(maxsize=8)
+def _load_ground_truth_roles(ground_truth_path, mtime):
+    """
+    Parse the speaker roles from a ground truth file, cached per path and mtime.
+    
+    Args:
+        ground_truth_path (str): Path to the ground truth JSON file
+        mtime (float): Modification time of the file, so edits are picked up
+        
+    Returns:
+        dict: Dictionary of speaker_id -> role
+    """
+    with open(ground_truth_path, 'r', encoding='utf-8') as f:
+        ground_truth = json.load(f)
+    
+    ground_truth_roles = {}
+    if isinstance(ground_truth, dict) and "speakers" in ground_truth:
+        for speaker in ground_truth["speakers"]:
+            if isinstance(speaker, dict) and "id" in speaker and "role" in speaker:
+                ground_truth_roles[speaker["id"]] = speaker["role"]
+    return ground_truth_roles
+
+def load_ground_truth_roles(ground_truth_path):
+    """
+    Load the speaker roles from a ground truth file.
+    
+    The file is only parsed again when it has changed since the last load.
+    
+    Args:
+        ground_truth_path (str): Path to the ground truth JSON file
+        
+    Returns:
+        dict: Dictionary of speaker_id -> role, shared between callers
+    """
+    return _load_ground_truth_roles(ground_truth_path, os.path.getmtime(ground_truth_path))
+
 def main():
     """Main function."""
     # Parse arguments
@@ -849,11 +1129,7 @@ def main():
     audio_file_path = args.audio_file
     speakers_info_path = args.speakers_info
     
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    configure_logging()
     
     # Generate test file if requested
     if args.generate:
@@ -883,20 +1159,29 @@ def main():
         speakers = {}
         transcription_lines = []
         
+        # Map voices to speaker names, the first speaker with a voice wins
+        name_by_voice = {}
+        for speaker in speakers_data.get('speakers', []):
+            name_by_voice.setdefault(speaker.get('voice'), speaker.get('name'))
+        
+        # Ground truth segments are timestamped from their offset into the
+        # meeting. Segments without an "offset" (in seconds) are placed after
+        # the speech before them, estimated from its word count.
+        start_time = time.time()
+        offset = 0.0
+        
         for i, segment in enumerate(speakers_data.get('segments', [])):
             role = segment.get('role')
             voice = segment.get('voice')
             text = segment.get('text')
             
             # Find the speaker name
-            speaker_name = None
-            for speaker in speakers_data.get('speakers', []):
-                if speaker.get('voice') == voice:
-                    speaker_name = speaker.get('name')
-                    break
+            speaker_name = name_by_voice.get(voice) or f"Speaker {i+1}"
             
-            if not speaker_name:
-                speaker_name = f"Speaker {i+1}"
+            # Get the timestamp
+            offset = segment.get('offset', offset)
+            timestamp = dt.fromtimestamp(start_time + offset).strftime("%H:%M:%S")
+            offset += len((text or "").split()) / SPEAKING_RATE_WORDS_PER_SECOND
             
             # Create a speaker ID
             speaker_id = f"speaker_{i+1}"
@@ -908,10 +1193,9 @@ def main():
             speaker_analyzer.add_utterance(speaker_id, text)
             
             # Add to transcription
-            timestamp = dt.now().strftime("%H:%M:%S")
-            formatted_line = f"[{timestamp}] {speaker_name}: {text}"
-            transcription_lines.append(formatted_line)
-            print(formatted_line)
+            line = f"[{timestamp}] {speaker_name}: {text}"
+            transcription_lines.append(line)
+            print(line)
         
         # Initialize Azure OpenAI for LLM analysis
         try:
@@ -924,10 +1208,10 @@ def main():
             def get_completion(request):
                 return "LLM analysis not available."
         
-        # Analyze speakers with LLM
+        # Analyze all speakers with a single LLM request on the LLM thread pool
         print("\nPerforming LLM analysis of speaker roles...")
-        speaker_analyzer.start_parallel_analysis(get_completion)
-        speaker_analyzer.stop_parallel_analysis()
+        analysis_future = speaker_analyzer.submit_analysis(get_completion)
+        analysis_future.result()
         speaker_roles = speaker_analyzer.get_results()
         
         # Create results dictionary
@@ -986,23 +1270,15 @@ def main():
     if args.ground_truth and os.path.exists(args.ground_truth):
         print("\n=== Comparing with Ground Truth ===")
         try:
-            with open(args.ground_truth, 'r', encoding='utf-8') as f:
-                ground_truth = json.load(f)
-            
-            # Extract ground truth speaker roles
-            ground_truth_roles = {}
-            if isinstance(ground_truth, dict) and "speakers" in ground_truth:
-                for speaker in ground_truth["speakers"]:
-                    if isinstance(speaker, dict) and "id" in speaker and "role" in speaker:
-                        ground_truth_roles[speaker["id"]] = speaker["role"]
+            ground_truth_roles = load_ground_truth_roles(args.ground_truth)
             
             # Compare detected roles with ground truth
+            detected_roles = {}
+            for speaker_info in results["speaker_infos"]:
+                detected_roles.setdefault(speaker_info["id"], speaker_info["role"])
+            
             for speaker_id, speaker_name in results["speakers"].items():
-                detected_role = "unknown"
-                for speaker_info in results["speaker_infos"]:
-                    if speaker_info["id"] == speaker_id:
-                        detected_role = speaker_info["role"]
-                        break
+                detected_role = detected_roles.get(speaker_id, "unknown")
                 
                 ground_truth_role = ground_truth_roles.get(speaker_id, "unknown")
                 
@@ -1022,7 +1298,5 @@ def main():
     
     print(f"\nResults saved to {output_file}")
 
-print_lock = threading.Lock()
-
 if __name__ == "__main__":
     main()
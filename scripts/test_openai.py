@@ -1,24 +1,76 @@
 import os
 import sys
+import argparse
+import json
+import time
 import logging
 from pathlib import Path
 
 # Add the project root to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from azure.identity import DefaultAzureCredential
-from openai import AzureOpenAI
-from src.auth import get_credential
 from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_CAPABLE_MODEL
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def test_openai_service():
+# Model IDs are cached on disk for this many seconds between runs
+MODELS_CACHE_PATH = Path.home() / ".cache" / "speech2doc" / "models.json"
+MODELS_CACHE_TTL_SECONDS = 3600
+
+def list_model_ids(client):
+    """
+    Get the IDs of the models available on the Azure OpenAI endpoint.
+    
+    The IDs are read from MODELS_CACHE_PATH when it was written for the same
+    endpoint less than MODELS_CACHE_TTL_SECONDS ago, otherwise they are listed
+    through the API and the cache file is replaced.
+    
+    Args:
+        client: The AzureOpenAI client
+        
+    Returns:
+        list: The model IDs
+    """
+    try:
+        if time.time() - MODELS_CACHE_PATH.stat().st_mtime < MODELS_CACHE_TTL_SECONDS:
+            with open(MODELS_CACHE_PATH, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("endpoint") == AZURE_OPENAI_ENDPOINT:
+                logger.info(f"Using cached model list from {MODELS_CACHE_PATH}")
+                return cached["ids"]
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    model_ids = [model.id for model in client.models.list()]
+    
+    # Write to a temporary file first so readers never see a partial cache
+    try:
+        MODELS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = MODELS_CACHE_PATH.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"endpoint": AZURE_OPENAI_ENDPOINT, "ids": model_ids}, f)
+        os.replace(tmp_path, MODELS_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write model cache: {str(e)}")
+    
+    return model_ids
+
+def test_openai_service(list_models=False):
     """
-    Test connectivity to Azure OpenAI service and check for available models.
+    Test connectivity to Azure OpenAI service with a one-token completion.
+    
+    A missing deployment makes the completion fail with NotFoundError, so the
+    available models are only listed when asked for.
+    
+    Args:
+        list_models: Also list the available models/deployments
     """
+    # Imported here so that --help does not load the Azure and OpenAI SDKs
+    from openai import AzureOpenAI, NotFoundError
+    from src.auth import get_credential, get_token
+    
     try:
         # Get Azure credentials using our robust authentication approach
         logger.info("Getting Azure credentials using DefaultAzureCredential with fallback...")
@@ -26,7 +78,7 @@ def test_openai_service():
         
         # Get access token for Azure OpenAI
         logger.info("Getting access token for Azure OpenAI...")
-        token = credential.get_token("https://cognitiveservices.azure.com/.default").token
+        token = get_token(credential)
         
         # Initialize Azure OpenAI client with token-based authentication
         logger.info(f"Initializing Azure OpenAI client with endpoint: {AZURE_OPENAI_ENDPOINT}")
@@ -38,26 +90,24 @@ def test_openai_service():
             azure_ad_token=token
         )
         
-        # List available models/deployments
-        logger.info("Listing available models/deployments...")
-        models = client.models.list()
-        
-        # Check if our configured model is available
-        model_found = False
-        logger.info(f"Looking for model: {AZURE_OPENAI_CAPABLE_MODEL}")
-        
-        logger.info("Available models:")
-        for model in models:
-            logger.info(f"- {model.id}")
-            if model.id == AZURE_OPENAI_CAPABLE_MODEL:
-                model_found = True
-        
-        if model_found:
-            logger.info(f" Model '{AZURE_OPENAI_CAPABLE_MODEL}' is available")
-        else:
-            logger.warning(f" Model '{AZURE_OPENAI_CAPABLE_MODEL}' was not found in the available models")
+        if list_models:
+            # List available models/deployments
+            logger.info("Listing available models/deployments...")
+            model_ids = list_model_ids(client)
+            
+            # Check if our configured model is available
+            logger.info(f"Looking for model: {AZURE_OPENAI_CAPABLE_MODEL}")
+            
+            logger.info("Available models:")
+            for model_id in model_ids:
+                logger.info(f"- {model_id}")
+            
+            if AZURE_OPENAI_CAPABLE_MODEL in set(model_ids):
+                logger.info(f" Model '{AZURE_OPENAI_CAPABLE_MODEL}' is available")
+            else:
+                logger.warning(f" Model '{AZURE_OPENAI_CAPABLE_MODEL}' was not found in the available models")
         
-        # Test a simple completion to verify the service is working
+        # Test a one-token completion to verify the service and the deployment
         logger.info("Testing a simple completion...")
         
         try:
@@ -67,13 +117,17 @@ def test_openai_service():
                     {"role": "system", "content": "You are a helpful assistant."},
                     {"role": "user", "content": "Hello, are you working properly?"}
                 ],
-                max_tokens=50
+                max_tokens=1
             )
             
             logger.info("OpenAI API response received:")
             logger.info(f"Response: {response.choices[0].message.content}")
             logger.info(" Azure OpenAI service is working correctly")
             
+        except NotFoundError as api_error:
+            logger.error(f"Model '{AZURE_OPENAI_CAPABLE_MODEL}' was not found: {str(api_error)}")
+            logger.warning(" Azure OpenAI service API call failed")
+            raise
         except Exception as api_error:
             logger.error(f"Error making API call: {str(api_error)}")
             logger.warning(" Azure OpenAI service API call failed")
@@ -84,4 +138,8 @@ def test_openai_service():
         raise
 
 if __name__ == "__main__":
-    test_openai_service()
+    parser = argparse.ArgumentParser(description="Test connectivity to Azure OpenAI service")
+    parser.add_argument("--verbose", action="store_true", help="Also list the available models/deployments")
+    args = parser.parse_args()
+    
+    test_openai_service(list_models=args.verbose)
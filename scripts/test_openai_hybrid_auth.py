@@ -7,14 +7,15 @@ Follows the WebScraper-RAG authentication pattern with proper fallback mechanism
 import os
 import sys
 import json
-import time
 from dotenv import load_dotenv
-from azure.identity import DefaultAzureCredential, AzureCliCredential, ChainedTokenCredential
-import requests
+from azure.core.exceptions import ClientAuthenticationError
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from src.auth import get_access_token, get_chained_credential
+from _openai_client import REQUEST_TIMEOUT, session
+
 # Load environment variables
 load_dotenv()
 
@@ -23,6 +24,7 @@ AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
 AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+CHAT_COMPLETIONS_URL = f"{(AZURE_OPENAI_ENDPOINT or '').rstrip('/')}/openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
 
 class AzureOpenAIAuthenticator:
     """Class to handle Azure OpenAI authentication with proper fallback mechanisms."""
@@ -34,49 +36,32 @@ class AzureOpenAIAuthenticator:
         self.auth_method = None
     
     def authenticate(self):
-        """Try different authentication methods in order of preference."""
-        auth_methods = [
-            self._try_default_azure_credential,
-            self._try_azure_cli_credential,
-            self._try_api_key
-        ]
-        
-        for method in auth_methods:
-            success = method()
-            if success:
-                return True
+        """Try token-based authentication first and fall back to the API key."""
+        if self._try_token_credential():
+            return True
+        if self._try_api_key():
+            return True
         
         print("All authentication methods failed.")
         return False
     
-    def _try_default_azure_credential(self):
-        """Try authenticating with DefaultAzureCredential."""
-        try:
-            print("Trying DefaultAzureCredential...")
-            credential = DefaultAzureCredential(additionally_allowed_tenants=["*"])
-            token = credential.get_token("https://cognitiveservices.azure.com/.default")
-            self.credential = credential
-            self.token = token
-            self.auth_method = "DefaultAzureCredential"
-            print("Successfully authenticated with DefaultAzureCredential")
-            return True
-        except Exception as e:
-            print(f"DefaultAzureCredential failed: {str(e)}")
-            return False
-    
-    def _try_azure_cli_credential(self):
-        """Try authenticating with AzureCliCredential."""
+    def _try_token_credential(self):
+        """
+        Try authenticating with DefaultAzureCredential, then AzureCliCredential.
+        
+        Only authentication failures return False; other errors, such as
+        network failures, are raised since the API key would not help.
+        """
         try:
-            print("Trying AzureCliCredential...")
-            credential = AzureCliCredential()
-            token = credential.get_token("https://cognitiveservices.azure.com/.default")
+            print("Trying DefaultAzureCredential and AzureCliCredential...")
+            credential = get_chained_credential(additionally_allowed_tenants=["*"])
+            self.token = get_access_token(credential)
             self.credential = credential
-            self.token = token
-            self.auth_method = "AzureCliCredential"
-            print("Successfully authenticated with AzureCliCredential")
+            self.auth_method = "ChainedTokenCredential"
+            print("Successfully authenticated with ChainedTokenCredential")
             return True
-        except Exception as e:
-            print(f"AzureCliCredential failed: {str(e)}")
+        except ClientAuthenticationError as e:
+            print(f"Token-based authentication failed: {str(e)}")
             return False
     
     def _try_api_key(self):
@@ -93,10 +78,9 @@ class AzureOpenAIAuthenticator:
         """Get the appropriate headers based on the authentication method."""
         headers = {"Content-Type": "application/json"}
         
-        if self.auth_method in ["DefaultAzureCredential", "AzureCliCredential"]:
-            # Refresh token if needed
-            if self.token.expires_on < time.time() + 300:  # Refresh if expires in less than 5 minutes
-                self.token = self.credential.get_token("https://cognitiveservices.azure.com/.default")
+        if self.auth_method == "ChainedTokenCredential":
+            # Reuse the process-wide token, refreshed when it is about to expire
+            self.token = get_access_token(self.credential)
             
             headers["Authorization"] = f"Bearer {self.token.token}"
         elif self.auth_method == "ApiKey":
@@ -126,15 +110,15 @@ def test_azure_openai():
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": "Hello, can you hear me?"}
             ],
-            "max_tokens": 100
+            "max_tokens": 1
         }
         
         # Make API call
-        url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+        url = CHAT_COMPLETIONS_URL
         print(f"Making request to: {url}")
         print(f"Using authentication method: {authenticator.auth_method}")
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
         
         # Check response
         if response.status_code == 200:
@@ -148,7 +132,7 @@ def test_azure_openai():
             print(response.text)
             
             # If token-based auth failed, try API key as fallback
-            if authenticator.auth_method in ["DefaultAzureCredential", "AzureCliCredential"] and "PermissionDenied" in response.text:
+            if authenticator.auth_method == "ChainedTokenCredential" and "PermissionDenied" in response.text:
                 print("\nToken-based authentication failed with permission denied. Trying API key as fallback...")
                 authenticator = AzureOpenAIAuthenticator()
                 # Skip to API key directly
@@ -157,7 +141,7 @@ def test_azure_openai():
                 
                 # Try again with API key
                 print(f"Retrying with authentication method: {authenticator.auth_method}")
-                response = requests.post(url, headers=headers, json=payload)
+                response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
                 
                 if response.status_code == 200:
                     result = response.json()
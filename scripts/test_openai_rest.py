@@ -1,14 +1,14 @@
 import os
 import sys
 import logging
-import requests
 from pathlib import Path
 
 # Add the project root to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.auth import get_credential
+from src.auth import get_credential, get_token
 from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION
+from _openai_client import REQUEST_TIMEOUT, session
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,7 +28,7 @@ def test_openai_service():
         
         # Get access token for Azure OpenAI
         logger.info("Getting access token for Azure OpenAI...")
-        token = credential.get_token("https://cognitiveservices.azure.com/.default").token
+        token = get_token(credential)
         
         # Test using direct REST API calls instead of the SDK to avoid version issues
         logger.info(f"Testing Azure OpenAI service at endpoint: {AZURE_OPENAI_ENDPOINT}")
@@ -50,11 +50,11 @@ def test_openai_service():
                 {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": "Hello, are you working properly?"}
             ],
-            "max_tokens": 50
+            "max_tokens": 1
         }
         
         logger.info(f"Sending request to: {completion_url}")
-        completion_response = requests.post(completion_url, headers=headers, json=completion_payload)
+        completion_response = session.post(completion_url, headers=headers, json=completion_payload, timeout=REQUEST_TIMEOUT)
         
         if completion_response.status_code == 200:
             completion_data = completion_response.json()
@@ -1,14 +1,14 @@
 import os
 import sys
 import logging
-import requests
 from pathlib import Path
 from getpass import getpass
 
 # Add the project root to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION
+from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_API_KEY
+from _openai_client import chat, chat_completions_url, print_streamed_completion
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,11 +22,14 @@ def test_openai_service_with_key():
     Test connectivity to Azure OpenAI service using API key authentication.
     """
     try:
-        # Get API key from user input (this won't be stored in logs or history)
-        api_key = getpass("Enter your Azure OpenAI API key: ")
+        # Use the API key from the environment, or ask for it when running
+        # interactively (this won't be stored in logs or history)
+        api_key = AZURE_OPENAI_API_KEY
+        if not api_key and sys.stdin.isatty():
+            api_key = getpass("Enter your Azure OpenAI API key: ")
         
         if not api_key:
-            logger.error("API key is required to test the Azure OpenAI service")
+            logger.error("API key is required to test the Azure OpenAI service, set AZURE_OPENAI_API_KEY")
             return
         
         # Test using direct REST API calls
@@ -42,7 +45,7 @@ def test_openai_service_with_key():
         # Test a simple completion to verify the service is working
         logger.info("Testing a simple completion...")
         
-        completion_url = f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+        completion_url = chat_completions_url(AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION)
         
         completion_payload = {
             "messages": [
@@ -53,14 +56,12 @@ def test_openai_service_with_key():
         }
         
         logger.info(f"Sending request to: {completion_url}")
-        completion_response = requests.post(completion_url, headers=headers, json=completion_payload)
+        completion_response = chat(completion_url, headers, completion_payload, stream=True)
         
         if completion_response.status_code == 200:
-            completion_data = completion_response.json()
-            response_content = completion_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-            
+            # Print the response as it is generated
             logger.info("OpenAI API response received:")
-            logger.info(f"Response: {response_content}")
+            print_streamed_completion(completion_response)
             logger.info("✅ Azure OpenAI service is working correctly")
             
             # Suggest updating the .env file with the API key
@@ -6,37 +6,44 @@ Following the WebScraper-RAG authentication pattern.
 
 import os
 import sys
-import json
 from dotenv import load_dotenv
 from azure.identity import DefaultAzureCredential, AzureCliCredential
-import requests
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.auth import get_access_token
 from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION
+from _openai_client import chat, chat_completions_url, print_streamed_completion
 
 # Load environment variables
 load_dotenv()
 
+# Chat completions URL for the deployment, built once
+AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
+CHAT_COMPLETIONS_URL = chat_completions_url(AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION)
+
 def get_credential():
     """
     Get Azure credential using DefaultAzureCredential with fallback to AzureCliCredential.
     Following the WebScraper-RAG authentication pattern.
+    
+    Returns:
+        A tuple of the credential and the Azure OpenAI access token used to validate it
     """
     try:
         # Try DefaultAzureCredential first (primary method)
         credential = DefaultAzureCredential(additionally_allowed_tenants=["*"])
-        token = credential.get_token("https://cognitiveservices.azure.com/.default")
+        token = get_access_token(credential)
         print("Successfully authenticated with DefaultAzureCredential")
-        return credential
+        return credential, token
     except Exception as e:
         print(f"DefaultAzureCredential failed: {str(e)}")
         try:
             # Fall back to AzureCliCredential
             credential = AzureCliCredential()
-            token = credential.get_token("https://cognitiveservices.azure.com/.default")
+            token = get_access_token(credential)
             print("Successfully authenticated with AzureCliCredential")
-            return credential
+            return credential, token
         except Exception as cli_error:
             print(f"AzureCliCredential also failed: {str(cli_error)}")
             raise Exception("All authentication methods failed")
@@ -44,14 +51,10 @@ def get_credential():
 def test_azure_openai():
     """Test connection to Azure OpenAI using managed identity."""
     try:
-        # Get credential
-        credential = get_credential()
-        
-        # Get access token for Azure OpenAI
-        token = credential.get_token("https://cognitiveservices.azure.com/.default")
+        # Get credential and the access token for Azure OpenAI
+        credential, token = get_credential()
         
         # Set up API call
-        deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
         headers = {
             "Authorization": f"Bearer {token.token}",
             "Content-Type": "application/json"
@@ -67,17 +70,16 @@ def test_azure_openai():
         }
         
         # Make API call
-        url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{deployment_name}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+        url = CHAT_COMPLETIONS_URL
         print(f"Making request to: {url}")
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = chat(url, headers, payload, stream=True)
         
-        # Check response
+        # Check response, printing it as it is generated
         if response.status_code == 200:
-            result = response.json()
             print("Successfully connected to Azure OpenAI!")
             print("Response:")
-            print(json.dumps(result, indent=2))
+            print_streamed_completion(response)
             return True
         else:
             print(f"Error: {response.status_code}")
@@ -7,7 +7,6 @@ speaker identification capabilities during a live meeting.
 
 import os
 import sys
-import time
 import threading
 from dotenv import load_dotenv
 
@@ -59,15 +58,23 @@ def manual_speaker_test():
         transcription_thread.daemon = True
         transcription_thread.start()
         
-        # Keep the main thread running to display status
+        # Keep the main thread running to display status whenever it changes,
+        # rendering the speakers and structured data only when they have changed
+        rendered_version = -1
         while True:
-            time.sleep(1)
-            print(f"Status: {recorder.current_status if hasattr(recorder, 'current_status') else 'Initializing...'}")
+            recorder.status_changed.wait()
+            recorder.status_changed.clear()
+            print(f"Status: {recorder.status_message}")
             
             # Display the most recent transcription line if available
             if hasattr(recorder, 'transcription_lines') and recorder.transcription_lines:
                 print(f"Latest: {recorder.transcription_lines[-1]}")
             
+            state_version = recorder.state_version
+            if state_version == rendered_version:
+                continue
+            rendered_version = state_version
+            
             # Display speaker information if available
             if hasattr(recorder, 'speakers') and recorder.speakers:
                 print("\nSpeaker Information:")
@@ -99,7 +106,7 @@ def manual_speaker_test():
     except KeyboardInterrupt:
         print("\nTest stopped by user.")
         recorder.recording = False
-        time.sleep(2)  # Give time for threads to clean up
+        transcription_thread.join(timeout=2)  # Let transcription stop cleanly
     except Exception as e:
         print(f"Error during test: {str(e)}")
         import traceback
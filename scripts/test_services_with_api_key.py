@@ -6,9 +6,9 @@ Test script for Azure AI Services (OpenAI and Speech) using API key authenticati
 import os
 import sys
 import json
+import argparse
 from dotenv import load_dotenv
-import requests
-import azure.cognitiveservices.speech as speechsdk
+from _openai_client import REQUEST_TIMEOUT, session, chat, chat_completions_url, deployments_url, print_streamed_completion, probe_speech
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -16,24 +16,35 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 # Load environment variables
 load_dotenv()
 
-# API Key for testing
-API_KEY = "9H25P6p1ygTk98MMdZc3gzgCW1r2meZ4GqZ9ZV9jHN1himdoOmRSJQQJ99BCACfhMk5XJ3w3AAAAACOGpLKd"
+# Azure OpenAI configuration, with the request URLs built once
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION")
+AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
+CHAT_COMPLETIONS_URL = chat_completions_url(AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_VERSION)
+DEPLOYMENTS_URL = deployments_url(AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION)
+
+def _api_key():
+    """
+    Get the Azure AI Services API key used by the tests.
+    
+    Returns:
+        str: The value of AZURE_TEST_API_KEY
+    """
+    api_key = os.environ.get("AZURE_TEST_API_KEY")
+    if not api_key:
+        raise ValueError("AZURE_TEST_API_KEY is not set")
+    return api_key
 
 def test_azure_openai():
     """Test connection to Azure OpenAI using API key authentication."""
     try:
-        # Get endpoint information
-        openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-        deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
-        
-        print(f"Using OpenAI endpoint: {openai_endpoint}")
-        print(f"Using API version: {api_version}")
-        print(f"Using deployment: {deployment_name}")
+        print(f"Using OpenAI endpoint: {AZURE_OPENAI_ENDPOINT}")
+        print(f"Using API version: {AZURE_OPENAI_API_VERSION}")
+        print(f"Using deployment: {AZURE_OPENAI_DEPLOYMENT}")
         
         # Set up API call
         headers = {
-            "api-key": API_KEY,
+            "api-key": _api_key(),
             "Content-Type": "application/json"
         }
         
@@ -47,17 +58,16 @@ def test_azure_openai():
         }
         
         # Make API call
-        url = f"{openai_endpoint}openai/deployments/{deployment_name}/chat/completions?api-version={api_version}"
+        url = CHAT_COMPLETIONS_URL
         print(f"Making request to: {url}")
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = chat(url, headers, payload, stream=True)
         
-        # Check response
+        # Check response, printing it as it is generated
         if response.status_code == 200:
-            result = response.json()
             print("Successfully connected to Azure OpenAI!")
             print("Response:")
-            print(json.dumps(result, indent=2))
+            print_streamed_completion(response)
             return True
         else:
             print(f"Error: {response.status_code}")
@@ -68,8 +78,21 @@ def test_azure_openai():
         print(f"Error: {str(e)}")
         return False
 
+def test_speech_key():
+    """Check that the Speech service accepts the API key, without synthesizing speech."""
+    try:
+        api_key = _api_key()
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return False
+    return probe_speech(api_key, os.getenv("SPEECH_REGION", "swedencentral"))
+
 def test_azure_speech():
     """Test connection to Azure Speech service using API key."""
+    # Imported here so that the OpenAI checks do not wait for the Speech SDK's
+    # native library to load
+    import azure.cognitiveservices.speech as speechsdk
+    
     try:
         # Get endpoint information
         speech_endpoint = os.getenv("SPEECH_ENDPOINT")
@@ -80,7 +103,7 @@ def test_azure_speech():
         
         # Create speech config with API key
         speech_config = speechsdk.SpeechConfig(
-            subscription=API_KEY,
+            subscription=_api_key(),
             region=speech_region
         )
         
@@ -110,24 +133,20 @@ def test_azure_speech():
 def test_openai_deployments():
     """List available OpenAI deployments using API key."""
     try:
-        # Get endpoint information
-        openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-        api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-        
-        print(f"Using OpenAI endpoint: {openai_endpoint}")
-        print(f"Using API version: {api_version}")
+        print(f"Using OpenAI endpoint: {AZURE_OPENAI_ENDPOINT}")
+        print(f"Using API version: {AZURE_OPENAI_API_VERSION}")
         
         # Set up API call
         headers = {
-            "api-key": API_KEY,
+            "api-key": _api_key(),
             "Content-Type": "application/json"
         }
         
         # Make API call to list deployments
-        url = f"{openai_endpoint}openai/deployments?api-version={api_version}"
+        url = DEPLOYMENTS_URL
         print(f"Making request to list deployments: {url}")
         
-        response = requests.get(url, headers=headers)
+        response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
         
         # Check response
         if response.status_code == 200:
@@ -146,6 +165,10 @@ def test_openai_deployments():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test Azure AI Services using API key authentication")
+    parser.add_argument("--full", action="store_true", help="Synthesize speech instead of only checking the Speech API key")
+    args = parser.parse_args()
+    
     print("Testing Azure AI Services with API key...")
     
     # First, check available OpenAI deployments
@@ -158,7 +181,7 @@ if __name__ == "__main__":
     
     # Test Speech service
     print("\n=== Testing Speech Service ===")
-    speech_success = test_azure_speech()
+    speech_success = test_azure_speech() if args.full else test_speech_key()
     
     # Summary
     print("\n=== Test Summary ===")
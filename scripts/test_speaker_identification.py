@@ -6,7 +6,8 @@ This script processes the test_advisory_meeting.wav file and attempts to identif
 
 import os
 import sys
-import time
+import threading
+from collections import Counter
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
 
@@ -20,22 +21,35 @@ load_dotenv()
 SPEECH_REGION = os.getenv("SPEECH_REGION", "swedencentral")
 SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
 
-def process_audio_file_with_speaker_id(audio_file_path):
+def make_speaker_id_extractor(result):
     """
-    Process an audio file and attempt to identify different speakers.
+    Build a function that reads the speaker ID from recognition results.
+    
+    Which attributes a result has depends only on its type, so this is
+    worked out once from the first result instead of for every segment.
+    A voice profile ID, when present, takes precedence over the speaker ID.
     
     Args:
-        audio_file_path: Path to the audio file to process
+        result: A recognition result of the type that will be processed
         
     Returns:
-        A list of tuples containing (speaker_id, text) for each recognized segment
+        A function that takes a recognition result and returns its speaker ID, or a falsy value
     """
-    if not os.path.exists(audio_file_path):
-        print(f"Error: Audio file not found at {audio_file_path}")
-        return []
-    
-    print(f"Processing audio file: {audio_file_path}")
+    if hasattr(result, 'properties'):
+        if hasattr(result, 'speaker_id'):
+            return lambda r: r.properties.get('VoiceProfileId') or r.speaker_id
+        return lambda r: r.properties.get('VoiceProfileId') or r.properties.get('SpeakerId')
+    if hasattr(result, 'speaker_id'):
+        return lambda r: r.speaker_id
+    return lambda r: None
+
+def build_speech_config():
+    """
+    Build the speech config used for speaker identification.
     
+    Returns:
+        A SpeechConfig for Swedish recognition with API key authentication
+    """
     # Initialize speech config with API key authentication
     speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
     
@@ -45,6 +59,28 @@ def process_audio_file_with_speaker_id(audio_file_path):
     # Enable speaker recognition
     speech_config.enable_audio_logging = True
     
+    return speech_config
+
+def process_audio_file_with_speaker_id(audio_file_path, speech_config=None):
+    """
+    Process an audio file and attempt to identify different speakers.
+    
+    Args:
+        audio_file_path: Path to the audio file to process
+        speech_config: Speech config to reuse, built with build_speech_config if not given
+        
+    Returns:
+        A list of tuples containing (speaker_id, text) for each recognized segment
+    """
+    if not os.path.exists(audio_file_path):
+        print(f"Error: Audio file not found at {audio_file_path}")
+        return []
+    
+    print(f"Processing audio file: {audio_file_path}")
+    
+    if speech_config is None:
+        speech_config = build_speech_config()
+    
     # Configure audio input from the file
     audio_config = speechsdk.audio.AudioConfig(filename=audio_file_path)
     
@@ -57,30 +93,27 @@ def process_audio_file_with_speaker_id(audio_file_path):
     # Store results
     results = []
     speakers = {}
-    done = False
+    segment_counts = Counter()  # Dictionary of speaker_id -> number of segments
+    done = threading.Event()
+    extract_speaker_id = None
     
     # Define callbacks
     def recognized_cb(evt):
+        nonlocal extract_speaker_id
         if evt.result.text:
             recognized_text = evt.result.text
             
-            # Get speaker ID if available
-            speaker_id = None
-            if hasattr(evt.result, 'speaker_id'):
-                speaker_id = evt.result.speaker_id
-            elif hasattr(evt.result, 'properties') and evt.result.properties.get('SpeakerId'):
-                speaker_id = evt.result.properties.get('SpeakerId')
-            
-            # Check for voice profile ID in properties
-            if hasattr(evt.result, 'properties') and evt.result.properties.get('VoiceProfileId'):
-                speaker_id = evt.result.properties.get('VoiceProfileId')
+            # Get speaker ID (or voice profile ID) if available
+            if extract_speaker_id is None:
+                extract_speaker_id = make_speaker_id_extractor(evt.result)
+            speaker_id = extract_speaker_id(evt.result)
             
             # If we have a speaker ID, track it
             if speaker_id:
-                if speaker_id not in speakers:
-                    speaker_num = len(speakers) + 1
-                    speakers[speaker_id] = f"Speaker {speaker_num}"
-                speaker_name = speakers[speaker_id]
+                speaker_name = speakers.get(speaker_id)
+                if speaker_name is None:
+                    speaker_name = speakers[speaker_id] = f"Speaker {len(speakers) + 1}"
+                segment_counts[speaker_id] += 1
             else:
                 speaker_name = "Unknown Speaker"
                 
@@ -88,16 +121,14 @@ def process_audio_file_with_speaker_id(audio_file_path):
             results.append((speaker_id, recognized_text))
     
     def session_stopped_cb(evt):
-        nonlocal done
         print("Session stopped")
-        done = True
+        done.set()
     
     def canceled_cb(evt):
-        nonlocal done
         print(f"Recognition canceled: {evt.reason}")
         if evt.reason == speechsdk.CancellationReason.Error:
             print(f"Error details: {evt.error_details}")
-        done = True
+        done.set()
     
     # Connect callbacks
     speech_recognizer.recognized.connect(recognized_cb)
@@ -109,8 +140,7 @@ def process_audio_file_with_speaker_id(audio_file_path):
     speech_recognizer.start_continuous_recognition()
     
     # Wait until recognition is complete
-    while not done:
-        time.sleep(0.5)
+    done.wait()
     
     # Stop recognition
     speech_recognizer.stop_continuous_recognition()
@@ -118,11 +148,26 @@ def process_audio_file_with_speaker_id(audio_file_path):
     # Print summary of speakers
     print("\nSpeaker Summary:")
     for speaker_id, speaker_name in speakers.items():
-        speaker_segments = [text for sid, text in results if sid == speaker_id]
-        print(f"{speaker_name} (ID: {speaker_id}): {len(speaker_segments)} segments")
+        print(f"{speaker_name} (ID: {speaker_id}): {segment_counts[speaker_id]} segments")
     
     return results
 
+def process_audio_files_with_speaker_id(audio_file_paths):
+    """
+    Process several audio files with one shared speech config.
+    
+    Args:
+        audio_file_paths: Paths to the audio files to process
+        
+    Returns:
+        A dictionary of audio file path -> list of (speaker_id, text) tuples
+    """
+    speech_config = build_speech_config()
+    return {
+        audio_file_path: process_audio_file_with_speaker_id(audio_file_path, speech_config)
+        for audio_file_path in audio_file_paths
+    }
+
 def test_file_with_diarization():
     """
     Test the speaker identification capabilities with the generated test audio file.
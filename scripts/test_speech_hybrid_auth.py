@@ -5,8 +5,9 @@ Test script for Azure Speech service using API key authentication.
 
 import os
 import sys
+import argparse
 from dotenv import load_dotenv
-import azure.cognitiveservices.speech as speechsdk
+from _openai_client import probe_speech
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -20,6 +21,10 @@ SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
 
 def test_azure_speech():
     """Test connection to Azure Speech using API key authentication."""
+    # Imported here so that the connectivity probe does not wait for the
+    # Speech SDK's native library to load
+    import azure.cognitiveservices.speech as speechsdk
+    
     try:
         print(f"Testing Azure Speech with region: {SPEECH_REGION}")
         print(f"Using API key authentication")
@@ -51,8 +56,15 @@ def test_azure_speech():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test connectivity to Azure Speech service using an API key")
+    parser.add_argument("--full", action="store_true", help="Synthesize speech instead of only checking the API key")
+    args = parser.parse_args()
+    
     print("Testing Azure Speech with API key authentication...")
-    success = test_azure_speech()
+    if args.full:
+        success = test_azure_speech()
+    else:
+        success = probe_speech(SPEECH_API_KEY, SPEECH_REGION)
     if success:
         print("Test completed successfully!")
     else:
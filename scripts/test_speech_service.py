@@ -8,6 +8,7 @@ from azure.identity import DefaultAzureCredential
 # Add the project root to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from src.auth import get_token
 from src.config import SPEECH_REGION, SPEECH_RESOURCE_NAME
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,7 +25,7 @@ def test_speech_service():
         
         # Get access token for Speech Service
         logger.info("Getting access token for Azure Speech Service...")
-        token = credential.get_token("https://cognitiveservices.azure.com/.default").token
+        token = get_token(credential)
         
         # Initialize Speech config with token
         logger.info(f"Initializing Speech config for region: {SPEECH_REGION}")
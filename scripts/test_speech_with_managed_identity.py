@@ -13,6 +13,7 @@ import azure.cognitiveservices.speech as speechsdk
 
 # Add the src directory to the path so we can import modules from there
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.auth import get_access_token
 
 # Load environment variables
 load_dotenv()
@@ -21,21 +22,24 @@ def get_credential():
     """
     Get Azure credential using DefaultAzureCredential with fallback to AzureCliCredential.
     Following the WebScraper-RAG authentication pattern.
+    
+    Returns:
+        A tuple of the credential and the Azure Speech access token used to validate it
     """
     try:
         # Try DefaultAzureCredential first (primary method)
         credential = DefaultAzureCredential(additionally_allowed_tenants=["*"])
-        token = credential.get_token("https://cognitiveservices.azure.com/.default")
+        token = get_access_token(credential)
         print("Successfully authenticated with DefaultAzureCredential")
-        return credential
+        return credential, token
     except Exception as e:
         print(f"DefaultAzureCredential failed: {str(e)}")
         try:
             # Fall back to AzureCliCredential
             credential = AzureCliCredential()
-            token = credential.get_token("https://cognitiveservices.azure.com/.default")
+            token = get_access_token(credential)
             print("Successfully authenticated with AzureCliCredential")
-            return credential
+            return credential, token
         except Exception as cli_error:
             print(f"AzureCliCredential also failed: {str(cli_error)}")
             raise Exception("All authentication methods failed")
@@ -43,11 +47,8 @@ def get_credential():
 def test_azure_speech():
     """Test connection to Azure Speech service using managed identity."""
     try:
-        # Get credential
-        credential = get_credential()
-        
-        # Get access token for Azure Speech
-        token = credential.get_token("https://cognitiveservices.azure.com/.default")
+        # Get credential and the access token for Azure Speech
+        credential, token = get_credential()
         
         # Set up Speech configuration
         speech_endpoint = os.getenv("SPEECH_ENDPOINT")
@@ -7,12 +7,11 @@ This verifies that the audio can be transcribed and structured according to the
 import os
 import sys
 import json
-import requests
+import argparse
 import threading
-import time
 import subprocess
 from dotenv import load_dotenv
-import azure.cognitiveservices.speech as speechsdk
+from _openai_client import REQUEST_TIMEOUT, session, transcribe_fast
 from pydantic import ValidationError
 
 # Add the src directory to the path so we can import modules from there
@@ -29,6 +28,9 @@ SPEECH_API_KEY = os.getenv("SPEECH_API_KEY")
 AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
 AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
 
+# Upper bound on the number of speakers told apart by diarization
+MAX_SPEAKERS = 4
+
 def play_audio(audio_file_path):
     """
     Play audio file using Windows Media Player in a separate thread.
@@ -44,77 +46,18 @@ def play_audio(audio_file_path):
 
 def transcribe_audio(audio_file_path):
     """
-    Transcribe a Swedish audio file using Azure Speech Service with API key authentication.
+    Transcribe a Swedish audio file with a single request to the Fast Transcription API.
+    
+    The whole file is uploaded at once and the service returns the complete
+    transcription, so the test does not have to stream the audio in real time.
     """
     try:
         print(f"Transkriberar ljudfil: {audio_file_path}")
         
-        # Start playing the audio file in a separate thread
-        audio_thread = threading.Thread(target=play_audio, args=(audio_file_path,))
-        audio_thread.daemon = True
-        audio_thread.start()
-        
-        # Initialize speech config with API key authentication
-        speech_config = speechsdk.SpeechConfig(subscription=SPEECH_API_KEY, region=SPEECH_REGION)
-        
-        # Set Swedish language explicitly
-        speech_config.speech_recognition_language = "sv-SE"
-        
-        # Configure audio input
-        audio_input = speechsdk.AudioConfig(filename=audio_file_path)
-        
-        # Create speech recognizer with Swedish language
-        speech_recognizer = speechsdk.SpeechRecognizer(
-            speech_config=speech_config,
-            audio_config=audio_input
-        )
-        
-        # Variable to store the complete transcription
-        transcription = ""
-        done = False
-        
-        # Define callbacks
-        def recognized_cb(evt):
-            nonlocal transcription
-            print(f"IGENKÄNT: {evt.result.text}")
-            transcription += evt.result.text + " "
-        
-        def session_stopped_cb(evt):
-            nonlocal done
-            print("Session avslutad")
-            done = True
-        
-        def canceled_cb(evt):
-            nonlocal done
-            print(f"Igenkänning avbruten: {evt.reason}")
-            if evt.reason == speechsdk.CancellationReason.Error:
-                print(f"Feldetaljer: {evt.error_details}")
-            done = True
-        
-        # Connect callbacks
-        speech_recognizer.recognized.connect(recognized_cb)
-        speech_recognizer.session_stopped.connect(session_stopped_cb)
-        speech_recognizer.canceled.connect(canceled_cb)
-        
-        # Start continuous recognition
-        print("Startar kontinuerlig igenkänning...")
-        speech_recognizer.start_continuous_recognition()
-        
-        # Wait for recognition to complete
-        max_wait_time = 120  # Maximum wait time in seconds
-        start_time = time.time()
-        
-        while not done and (time.time() - start_time) < max_wait_time:
-            time.sleep(0.5)
-        
-        # Stop recognition
-        speech_recognizer.stop_continuous_recognition()
-        
-        if not done:
-            print("Timeout - avbryter igenkänning")
+        transcription = transcribe_fast(audio_file_path, SPEECH_API_KEY, SPEECH_REGION, max_speakers=MAX_SPEAKERS)
         
         print("Transkription slutförd")
-        return transcription.strip()
+        return transcription
         
     except Exception as e:
         print(f"Fel vid taltranskription: {str(e)}")
@@ -162,7 +105,7 @@ def extract_structured_data(transcription):
         url = f"{AZURE_OPENAI_ENDPOINT}openai/deployments/{AZURE_OPENAI_DEPLOYMENT}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
         print(f"Gör förfrågan till: {url}")
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = session.post(url, headers=headers, json=payload, timeout=REQUEST_TIMEOUT)
         
         # Check response
         if response.status_code == 200:
@@ -194,14 +137,25 @@ def extract_structured_data(transcription):
         print(f"Fel vid extraktion av strukturerad data: {str(e)}")
         raise
 
-def process_audio_file(audio_file_path):
+def process_audio_file(audio_file_path, play=False):
     """
     Process an audio file through the full pipeline:
     1. Transcribe the audio
     2. Extract structured data from the transcription
     3. Validate against the Pydantic model
+    
+    Args:
+        audio_file_path: Path to the audio file
+        play: Play the audio file while it is processed. The transcription no
+            longer follows the audio in real time, so playback is optional.
     """
     try:
+        # Start playing the audio file in a separate thread
+        if play:
+            audio_thread = threading.Thread(target=play_audio, args=(audio_file_path,))
+            audio_thread.daemon = True
+            audio_thread.start()
+        
         # Step 1: Transcribe the audio
         transcription = transcribe_audio(audio_file_path)
         print(f"\nTranskription:\n{transcription}\n")
@@ -240,6 +194,10 @@ def process_audio_file(audio_file_path):
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Test the processing pipeline with the Swedish advisory meeting audio file")
+    parser.add_argument("--play", action="store_true", help="Play the audio file while it is processed (Windows only)")
+    args = parser.parse_args()
+    
     print("Testar bearbetningspipeline för rådgivningsmöte...")
     
     # Path to the generated test audio file
@@ -247,7 +205,7 @@ if __name__ == "__main__":
     
     # Process the audio file
     try:
-        result = process_audio_file(audio_file_path)
+        result = process_audio_file(audio_file_path, play=args.play)
         print("\nTest slutfördes framgångsrikt!")
         
         # Save the result to a file for reference
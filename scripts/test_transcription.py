@@ -8,6 +8,7 @@ import argparse
 sys.path.append(str(Path(__file__).parent.parent))
 
 from azure.identity import DefaultAzureCredential
+from src.auth import get_token
 from src.speech import transcribe_audio
 from src.config import SPEECH_REGION
 
@@ -22,18 +23,18 @@ def test_transcription(audio_file_path):
         audio_file_path: Path to the audio file to transcribe
     """
     try:
+        # Verify the audio file exists before authenticating
+        if not os.path.exists(audio_file_path):
+            logger.error(f"Audio file not found: {audio_file_path}")
+            return
+        
         # Get Azure credentials using DefaultAzureCredential
         logger.info("Getting Azure credentials using DefaultAzureCredential...")
         credential = DefaultAzureCredential()
         
-        # Get access token for Speech Service
+        # Get access token for Speech Service, reusing a cached one while it is valid
         logger.info("Getting access token for Azure Speech Service...")
-        token = credential.get_token("https://cognitiveservices.azure.com/.default").token
-        
-        # Verify the audio file exists
-        if not os.path.exists(audio_file_path):
-            logger.error(f"Audio file not found: {audio_file_path}")
-            return
+        token = get_token(credential)
         
         logger.info(f"Transcribing audio file: {audio_file_path}")
         
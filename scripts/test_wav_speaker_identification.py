@@ -8,7 +8,6 @@ capabilities, analyzing the speakers and their roles.
 import os
 import sys
 import json
-import time
 import threading
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
@@ -107,7 +106,7 @@ def transcribe_from_wav_file(recorder, wav_file):
                 recorder.update_status(f"Error loading speaker information: {str(e)}")
         
         # Variable to track if we're done processing
-        done = False
+        done = threading.Event()
         
         # Define callbacks for recognition events
         def recognized_cb(evt):
@@ -176,17 +175,15 @@ def transcribe_from_wav_file(recorder, wav_file):
             recorder.add_transcription_line(recognized_text, speaker_id)
         
         def session_stopped_cb(evt):
-            nonlocal done
             recorder.update_status("Session stopped")
-            done = True
+            done.set()
         
         def canceled_cb(evt):
-            nonlocal done
             reason = evt.reason
             recorder.update_status(f"Recognition canceled: {reason}")
             if reason == speechsdk.CancellationReason.Error:
                 recorder.update_status(f"Error details: {evt.error_details}")
-            done = True
+            done.set()
         
         # Connect callbacks to events
         speech_recognizer.recognized.connect(recognized_cb)
@@ -197,14 +194,12 @@ def transcribe_from_wav_file(recorder, wav_file):
         recorder.update_status("Starting continuous recognition...")
         speech_recognizer.start_continuous_recognition()
         
-        # Wait for the recognition to complete
+        # Wait until a callback signals the end of recognition
         timeout = 300  # 5 minutes timeout
-        start_time = time.time()
-        while not done and (time.time() - start_time) < timeout:
-            time.sleep(0.5)
+        finished = done.wait(timeout=timeout)
         
         # Stop recognition if timeout occurred
-        if not done:
+        if not finished:
             recorder.update_status("Timeout - stopping recognition")
             speech_recognizer.stop_continuous_recognition()
         
@@ -1,10 +1,22 @@
 import logging
+import threading
+import time
+import weakref
 from azure.identity import DefaultAzureCredential, AzureCliCredential, ChainedTokenCredential, get_bearer_token_provider
 from azure.core.exceptions import ClientAuthenticationError
 from openai import AzureOpenAI
 
 logger = logging.getLogger(__name__)
 
+# Tokens are reused until this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+
+# Per-process token cache: credential -> {scope: AccessToken}. Tokens are kept
+# per credential so a token issued to one identity is never handed to another,
+# and a credential's entries go away with the credential.
+_token_cache = weakref.WeakKeyDictionary()
+_token_cache_lock = threading.Lock()
+
 def get_credential(additionally_allowed_tenants=None):
     """
     Get Azure credential using DefaultAzureCredential with fallback to AzureCliCredential.
@@ -85,6 +97,29 @@ def get_chained_credential(additionally_allowed_tenants=None):
     
     return ChainedTokenCredential(default_credential, cli_credential)
 
+def get_access_token(credential, scope="https://cognitiveservices.azure.com/.default"):
+    """
+    Get an access token for Azure services, reusing a cached one while it is valid.
+    
+    The credential is only asked for a new token when it has no cached token
+    for the scope or it expires within TOKEN_REFRESH_MARGIN seconds, so repeated
+    calls do not pay for the credential's cache and network lookups.
+    
+    Args:
+        credential: The Azure credential to use
+        scope: The scope to request a token for
+        
+    Returns:
+        The AccessToken, with token and expires_on
+    """
+    with _token_cache_lock:
+        tokens = _token_cache.setdefault(credential, {})
+        token = tokens.get(scope)
+        if token is None or token.expires_on < time.time() + TOKEN_REFRESH_MARGIN:
+            token = credential.get_token(scope)
+            tokens[scope] = token
+        return token
+
 def get_token(credential, scope="https://cognitiveservices.azure.com/.default"):
     """
     Get an authentication token for Azure services.
@@ -96,7 +131,7 @@ def get_token(credential, scope="https://cognitiveservices.azure.com/.default"):
     Returns:
         The authentication token as a string
     """
-    return credential.get_token(scope).token
+    return get_access_token(credential, scope).token
 
 def create_azure_openai_client(endpoint, api_version, credential=None, api_key=None):
     """
@@ -121,7 +156,7 @@ def create_azure_openai_client(endpoint, api_version, credential=None, api_key=N
         logger.info("Creating Azure OpenAI client with token-based authentication")
         
         # Get token directly instead of using token provider
-        token = credential.get_token("https://cognitiveservices.azure.com/.default").token
+        token = get_token(credential)
         
         # Create client with only the required parameters
         client_kwargs = {
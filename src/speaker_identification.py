@@ -6,16 +6,22 @@ This module provides functionality to identify speakers and determine their role
 
 import os
 import json
-import re
+import functools
+import hashlib
 import time
+from datetime import datetime as dt
+import queue
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from datetime import datetime as dt
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import azure.cognitiveservices.speech as speechsdk
 from dotenv import load_dotenv
 from typing import Dict, List, Optional, Any, Union
 from pydantic import BaseModel, Field
-from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT
+from src.config import AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_DEPLOYMENT, AZURE_OPENAI_API_KEY
 from src.openai_client import ChatMessage
 
 # Load environment variables
@@ -34,6 +40,133 @@ except ImportError:
         temperature: float = 0.7
         max_tokens: int = 1000
 
+# Connect and read timeouts in seconds for the LLM calls, so a stalled
+# connection cannot hold an analysis worker indefinitely
+REQUEST_TIMEOUT = (3.05, 30)
+
+# Shared HTTP session so the many LLM calls made during speaker analysis reuse
+# TCP/TLS connections. Throttling and transient server errors are retried with
+# a short backoff.
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,
+        raise_on_status=False
+    )
+))
+
+# Thread pool for LLM analysis calls, so that recognition callbacks never wait
+# on the network and up to MAX_PARALLEL_LLM_CALLS calls can be in flight
+MAX_PARALLEL_LLM_CALLS = 8
+
+# Maximum number of recognition results waiting to be processed
+RESULT_QUEUE_SIZE = 2048
+_llm_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_LLM_CALLS)
+
+# Analysis requests arriving within this many seconds of each other are
+# collapsed into a single LLM call
+ANALYSIS_DEBOUNCE_SECONDS = 0.4
+
+# Number of parsed LLM analyses kept per SpeakerAnalyzer, least recently used first out
+ANALYSIS_CACHE_SIZE = 32
+
+
+def _extract_speaker_id(result_json):
+    """
+    Extract the speaker ID from a recognition result's JSON.
+    
+    The NBest alternatives are checked first, then the top-level Speaker and
+    SpeakerId fields.
+    
+    Args:
+        result_json (dict): The parsed recognition result
+        
+    Returns:
+        str: The speaker ID, or "Unknown" if the result has none
+    """
+    speaker_id = (
+        next((item["Speaker"] for item in result_json.get("NBest") or () if item.get("Speaker")), None)
+        or result_json.get("Speaker")
+        or result_json.get("SpeakerId")
+    )
+    return str(speaker_id) if speaker_id else "Unknown"
+
+
+# Decoder used to pull the analysis JSON out of LLM responses
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _extract_json(text):
+    """
+    Extract the first JSON object from a text.
+    
+    The decoder is tried at each opening brace in turn, so JSON wrapped in
+    markdown code blocks or surrounded by prose is found without a regex.
+    
+    Args:
+        text (str): The text to search
+        
+    Returns:
+        dict: The first JSON object in the text, or None if there is none
+    """
+    start = text.find("{")
+    while start != -1:
+        try:
+            result, _ = _JSON_DECODER.raw_decode(text, start)
+            if isinstance(result, dict):
+                return result
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+# System prompt for the speaker role analysis. It is the same for every call
+# and comes first, followed by the fixed instructions, so that requests share
+# the longest possible prefix for prompt caching.
+SPEAKER_ANALYSIS_SYSTEM_PROMPT = """
+You are an AI assistant that analyzes financial advisory meeting transcripts.
+Your task is to determine which speakers are financial advisors and which are clients.
+
+Financial advisors typically:
+- Use professional financial terminology
+- Provide advice and recommendations
+- Explain investment concepts
+- Ask questions to understand client needs
+- Present options and strategies
+
+Clients typically:
+- Ask questions about investments
+- Express concerns or goals
+- Share personal financial information
+- Respond to advisor recommendations
+- Make decisions based on advice
+
+Analyze the provided utterances and determine the role of each speaker.
+Return your analysis as a JSON object with the following structure:
+{
+    "roles": {
+        "speaker_id": "advisor" or "client"
+    },
+    "confidence": {
+        "speaker_id": confidence_score (0.0 to 1.0)
+    },
+    "reasoning": {
+        "speaker_id": "Brief explanation of why you classified this speaker as advisor or client"
+    }
+}
+""".strip()
+
+SPEAKER_ANALYSIS_INSTRUCTIONS = (
+    "Analyze these utterances and determine which speakers are financial advisors and which are clients.\n\n"
+    "Here are the utterances from each speaker in a financial advisory meeting:\n\n"
+)
+
 
 class SpeakerAnalyzer:
     """
@@ -50,8 +183,18 @@ class SpeakerAnalyzer:
         self.analysis_thread = None
         self.stop_analysis = False
         self.analysis_lock = threading.Lock()
+        self._cv = threading.Condition(self.analysis_lock)  # Signals new utterances to the analysis thread
+        self._analysis_timer = None  # Pending debounced analysis request
         self.min_utterances_per_speaker = 2  # Minimum utterances needed for analysis
-        self.last_utterance_count = {}  # Track utterance counts for parallel analysis
+        self._last_hash = None  # Hash of the utterances at the last successful analysis
+        self._utterances_digest = hashlib.sha256()  # Running hash over all utterances added so far
+        self._pending = {}  # Dictionary of utterances hash -> Event set when its analysis finishes
+        self._cache = OrderedDict()  # LRU of utterances hash -> parsed LLM result, at most ANALYSIS_CACHE_SIZE entries
+        self._sent_counts = {}  # Dictionary of speaker_id -> utterances already sent to the LLM
+        self._snapshot_seq = 0  # Sequence number of the latest utterances snapshot
+        self._applied_seq = 0  # Sequence number of the snapshot whose result was merged last
+        self._new_work_speakers = set()  # Speakers with new utterances since the last parallel analysis
+        self._prompt_k = 8  # Maximum utterances per speaker sent in one prompt
     
     def add_utterance(self, speaker_id, text):
         """
@@ -78,6 +221,12 @@ class SpeakerAnalyzer:
                 self.utterances[speaker_id] = []
             
             self.utterances[speaker_id].append(text)
+            self._utterances_digest.update(json.dumps([speaker_id, text]).encode("utf-8"))
+            
+            # Wake the analysis thread once the speaker has enough utterances
+            if len(self.utterances[speaker_id]) >= self.min_utterances_per_speaker:
+                self._new_work_speakers.add(speaker_id)
+                self._cv.notify()
             
             return is_new_speaker
     
@@ -93,10 +242,51 @@ class SpeakerAnalyzer:
         """
         return len(self.utterances.get(speaker_id, []))
     
+    def _select_top_k(self, texts):
+        """
+        Select the most informative utterances of a speaker for the prompt.
+        
+        Each utterance is scored by its length, weighted up by how recent it
+        is, and the top scoring ones are returned in their original order.
+        
+        Args:
+            texts (list): The utterances of a speaker, oldest first
+            
+        Returns:
+            list: At most self._prompt_k utterances
+        """
+        if len(texts) <= self._prompt_k:
+            return texts
+        count = len(texts)
+        ranked = sorted(
+            range(count),
+            key=lambda i: len(texts[i]) * (1 + 0.5 * (i / count)),
+            reverse=True
+        )
+        return [texts[i] for i in sorted(ranked[:self._prompt_k])]
+    
+    def _apply_result(self, result):
+        """
+        Update the roles, confidence, and reasoning from a parsed LLM result.
+        
+        Args:
+            result (dict): The parsed analysis returned by the LLM
+        """
+        if "roles" in result:
+            self.roles.update(result["roles"])
+        if "confidence" in result:
+            self.confidence.update(result["confidence"])
+        if "reasoning" in result:
+            self.reasoning.update(result["reasoning"])
+    
     def analyze_with_llm(self, get_completion_func):
         """
         Analyze the speakers using an LLM to determine their roles.
         
+        The analysis lock is only held while the utterances are snapshotted and
+        while the results are merged, never across the LLM call, so
+        add_utterance does not wait on the network.
+        
         Args:
             get_completion_func (callable): A function that takes a CompletionRequest and returns a completion
             
@@ -109,114 +299,136 @@ class SpeakerAnalyzer:
                 print("No utterances to analyze")
                 return False
             
-            # Prepare the prompt
-            system_prompt = """
-            You are an AI assistant that analyzes financial advisory meeting transcripts.
-            Your task is to determine which speakers are financial advisors and which are clients.
-            
-            Financial advisors typically:
-            - Use professional financial terminology
-            - Provide advice and recommendations
-            - Explain investment concepts
-            - Ask questions to understand client needs
-            - Present options and strategies
-            
-            Clients typically:
-            - Ask questions about investments
-            - Express concerns or goals
-            - Share personal financial information
-            - Respond to advisor recommendations
-            - Make decisions based on advice
-            
-            Analyze the provided utterances and determine the role of each speaker.
-            Return your analysis as a JSON object with the following structure:
-            {
-                "roles": {
-                    "speaker_id": "advisor" or "client"
-                },
-                "confidence": {
-                    "speaker_id": confidence_score (0.0 to 1.0)
-                },
-                "reasoning": {
-                    "speaker_id": "Brief explanation of why you classified this speaker as advisor or client"
-                }
-            }
-            """
-            
-            # Build the prompt with utterances for each speaker
-            prompt = "Here are the utterances from each speaker in a financial advisory meeting:\n\n"
+            # Skip the LLM call when these exact utterances were analyzed before,
+            # or are being analyzed right now. The hash is kept up to date by
+            # add_utterance, so this does not re-serialize the whole history.
+            utterances_hash = self._utterances_digest.hexdigest()
+            if utterances_hash == self._last_hash:
+                return True
+            pending = self._pending.get(utterances_hash)
+            if pending is None:
+                self._snapshot_seq += 1
+                if utterances_hash in self._cache:
+                    self._cache.move_to_end(utterances_hash)
+                    self._applied_seq = self._snapshot_seq
+                    self._apply_result(self._cache[utterances_hash])
+                    self._last_hash = utterances_hash
+                    return True
+                
+                # Snapshot what the prompt is built from
+                utterances = {speaker_id: list(texts) for speaker_id, texts in self.utterances.items()}
+                roles = dict(self.roles)
+                previous_sent_counts = dict(self._sent_counts)
+                seq = self._snapshot_seq
+                finished = self._pending[utterances_hash] = threading.Event()
+        
+        # Wait for the analysis of these utterances that is already running, so
+        # that a final analysis does not return before its results are merged
+        if pending is not None:
+            pending.wait()
+            with self.analysis_lock:
+                return utterances_hash in self._cache
+        
+        try:
+            # Build the prompt with utterances for each speaker. The fixed
+            # instructions come first and the changing parts last. Speakers that
+            # already have a role only send what they said since the last
+            # analysis; their earlier roles are passed along instead.
+            prompt_parts = [SPEAKER_ANALYSIS_INSTRUCTIONS]
+            if roles:
+                prompt_parts.append(f"Previously classified: {json.dumps(roles, ensure_ascii=False)}\n\n")
             
-            for speaker_id, texts in self.utterances.items():
-                prompt += f"Speaker {speaker_id}:\n"
-                for text in texts:
-                    prompt += f"- \"{text}\"\n"
-                prompt += "\n"
+            sent_counts = {}
+            for speaker_id, texts in utterances.items():
+                start = previous_sent_counts.get(speaker_id, 0) if speaker_id in roles else 0
+                sent_counts[speaker_id] = len(texts)
+                if start >= len(texts):
+                    continue
+                prompt_parts.append(f"Speaker {speaker_id}:\n")
+                prompt_parts.extend(f"- \"{text}\"\n" for text in self._select_top_k(texts[start:]))
+                prompt_parts.append("\n")
             
-            prompt += "Analyze these utterances and determine which speakers are financial advisors and which are clients."
+            prompt = "".join(prompt_parts)
             
             # Create the completion request using Pydantic model
             request = CompletionRequest(
                 prompt=prompt,
-                system_message=system_prompt,
-                temperature=0.3,  # Lower temperature for more consistent results
+                system_message=SPEAKER_ANALYSIS_SYSTEM_PROMPT,
+                temperature=0.0,  # Deterministic, so cached results stay valid
                 max_tokens=1000
             )
             
             # Get the completion
-            try:
-                print("Analyzing speakers with LLM...")
-                completion = get_completion_func(request)
-                
-                # Parse the completion as JSON
-                try:
-                    # Extract JSON from the response if it's wrapped in markdown code blocks
-                    if "```json" in completion:
-                        json_content = completion.split("```json")[1].split("```")[0].strip()
-                    elif "```" in completion:
-                        json_content = completion.split("```")[1].split("```")[0].strip()
-                    else:
-                        json_content = completion.strip()
-                    
-                    # Try to parse the response as JSON
-                    result = json.loads(json_content)
-                    
-                    # Update the roles, confidence, and reasoning
-                    if "roles" in result:
-                        self.roles.update(result["roles"])
-                    if "confidence" in result:
-                        self.confidence.update(result["confidence"])
-                    if "reasoning" in result:
-                        self.reasoning.update(result["reasoning"])
-                    
-                    return True
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing LLM response as JSON: {str(e)}")
-                    print(f"Raw response: {completion}")
-                    
-                    # Try to extract JSON from the response if it's embedded in text
-                    try:
-                        # Look for JSON-like patterns in the response
-                        match = re.search(r'({.*})', completion, re.DOTALL)
-                        if match:
-                            json_str = match.group(1)
-                            result = json.loads(json_str)
-                            
-                            # Update the roles, confidence, and reasoning
-                            if "roles" in result:
-                                self.roles.update(result["roles"])
-                            if "confidence" in result:
-                                self.confidence.update(result["confidence"])
-                            if "reasoning" in result:
-                                self.reasoning.update(result["reasoning"])
-                            
-                            return True
-                    except (json.JSONDecodeError, AttributeError) as e:
-                        print(f"Error extracting JSON from response: {str(e)}")
-                        return False
-                
-            except Exception as e:
-                print(f"Error getting completion from LLM: {str(e)}")
+            print("Analyzing speakers with LLM...")
+            completion = get_completion_func(request)
+            
+            # Parse the completion as JSON, also when it is wrapped in
+            # markdown code blocks or embedded in text
+            result = _extract_json(completion)
+            if result is None:
+                print("Error parsing LLM response as JSON")
+                print(f"Raw response: {completion}")
                 return False
+            
+            # Update the roles, confidence, and reasoning, unless a newer
+            # snapshot has already been merged; analyses can finish out of order
+            with self.analysis_lock:
+                self._cache[utterances_hash] = result
+                if len(self._cache) > ANALYSIS_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+                if seq > self._applied_seq:
+                    self._applied_seq = seq
+                    self._apply_result(result)
+                    self._last_hash = utterances_hash
+                    self._sent_counts = sent_counts
+            
+            return True
+            
+        except Exception as e:
+            print(f"Error getting completion from LLM: {str(e)}")
+            return False
+        finally:
+            with self.analysis_lock:
+                del self._pending[utterances_hash]
+            finished.set()
+    
+    def submit_analysis(self, get_completion_func):
+        """
+        Run analyze_with_llm on the shared LLM thread pool.
+        
+        Recognition callbacks use this so that they return immediately instead
+        of blocking on the LLM round trip.
+        
+        Args:
+            get_completion_func (callable): A function that takes a CompletionRequest and returns a completion
+            
+        Returns:
+            concurrent.futures.Future: Future resolving to the analyze_with_llm result
+        """
+        return _llm_executor.submit(self.analyze_with_llm, get_completion_func)
+    
+    def request_analysis(self, get_completion_func):
+        """
+        Request a speaker analysis, coalescing bursts of requests.
+        
+        Each request (re)starts a timer; the analysis only runs once no further
+        request has arrived for ANALYSIS_DEBOUNCE_SECONDS.
+        
+        Args:
+            get_completion_func (callable): A function that takes a CompletionRequest and returns a completion
+        """
+        with self.analysis_lock:
+            if self._analysis_timer:
+                self._analysis_timer.cancel()
+            self._analysis_timer = threading.Timer(ANALYSIS_DEBOUNCE_SECONDS, self._flush_analysis, args=(get_completion_func,))
+            self._analysis_timer.daemon = True
+            self._analysis_timer.start()
+    
+    def _flush_analysis(self, get_completion_func):
+        """Run the debounced analysis requested through request_analysis."""
+        with self.analysis_lock:
+            self._analysis_timer = None
+        self.submit_analysis(get_completion_func)
     
     def start_parallel_analysis(self, get_completion_func, min_utterances_per_speaker=2):
         """
@@ -228,37 +440,28 @@ class SpeakerAnalyzer:
         """
         self.min_utterances_per_speaker = min_utterances_per_speaker
         self.stop_analysis = False
-        self.last_utterance_count = {}
+        with self.analysis_lock:
+            self._new_work_speakers = {
+                spk_id for spk_id, utterances in self.utterances.items()
+                if len(utterances) >= self.min_utterances_per_speaker
+            }
         
         def analysis_thread_func():
             """Function to run in the parallel analysis thread."""
             print("Starting parallel speaker analysis thread...")
             
-            while not self.stop_analysis:
-                # Check if we have new utterances to analyze
-                should_analyze = False
-                
-                with self.analysis_lock:
-                    # Check if we have new utterances for any speaker
-                    current_counts = {spk_id: len(utterances) for spk_id, utterances in self.utterances.items()}
-                    
-                    # Compare with last counts
-                    for spk_id, count in current_counts.items():
-                        last_count = self.last_utterance_count.get(spk_id, 0)
-                        if count > last_count and count >= self.min_utterances_per_speaker:
-                            should_analyze = True
-                            break
+            while True:
+                # Wait until a speaker has new utterances to analyze (or we are stopped)
+                with self._cv:
+                    self._cv.wait_for(lambda: self.stop_analysis or self._new_work_speakers)
+                    if self.stop_analysis:
+                        break
                     
-                    # Update last counts
-                    if should_analyze:
-                        self.last_utterance_count = current_counts.copy()
+                    # The analysis below covers everything added so far
+                    self._new_work_speakers.clear()
                 
-                if should_analyze:
-                    print("Analyzing speakers in parallel thread...")
-                    self.analyze_with_llm(get_completion_func)
-                
-                # Sleep for a short time before checking again
-                time.sleep(1)
+                print("Analyzing speakers in parallel thread...")
+                self.analyze_with_llm(get_completion_func)
             
             print("Parallel speaker analysis thread stopped")
         
@@ -270,7 +473,12 @@ class SpeakerAnalyzer:
     def stop_parallel_analysis(self):
         """Stop the parallel analysis thread."""
         if self.analysis_thread:
-            self.stop_analysis = True
+            with self._cv:
+                self.stop_analysis = True
+                if self._analysis_timer:
+                    self._analysis_timer.cancel()
+                    self._analysis_timer = None
+                self._cv.notify_all()
             self.analysis_thread.join(timeout=2)
     
     def get_analysis_results(self):
@@ -317,6 +525,20 @@ class SpeakerAnalyzer:
             return json.dumps(results, ensure_ascii=False)
 
 
+@functools.lru_cache(maxsize=8)
+def chat_completions_url(deployment_name):
+    """
+    Get the chat completions URL for an Azure OpenAI deployment.
+    
+    Args:
+        deployment_name (str): The name of the deployment
+        
+    Returns:
+        str: The chat completions URL, built once per deployment
+    """
+    return f"{AZURE_OPENAI_ENDPOINT}/openai/deployments/{deployment_name}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+
+
 def get_completion_with_api_key(request):
     """
     Get a completion from Azure OpenAI API using the API key from environment variables.
@@ -327,10 +549,9 @@ def get_completion_with_api_key(request):
     Returns:
         str: The completion text
     """
-    # Get API key and endpoint from environment variables
-    api_key = os.environ.get("AZURE_OPENAI_API_KEY")
+    # API key and endpoint, read from the environment once at import
+    api_key = AZURE_OPENAI_API_KEY
     endpoint = AZURE_OPENAI_ENDPOINT
-    api_version = AZURE_OPENAI_API_VERSION
     
     if not api_key or not endpoint:
         print("Error: Azure OpenAI API key or endpoint not found in environment variables")
@@ -372,9 +593,9 @@ def get_completion_with_api_key(request):
     
     # Make the API request
     try:
-        url = f"{endpoint}/openai/deployments/{deployment_name}/chat/completions?api-version={api_version}"
+        url = chat_completions_url(deployment_name)
         print(f"Making request to: {url}")
-        response = requests.post(url, headers=headers, json=body)
+        response = _session.post(url, headers=headers, json=body, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Raise an exception for HTTP errors
         
         # Parse the response
@@ -498,69 +719,64 @@ def identify_speakers_from_audio(audio_file_path, timeout=60, output_dir=None):
     print("Starting parallel speaker analysis...")
     speaker_analyzer.start_parallel_analysis(get_completion_func, min_utterances_per_speaker=2)
     
-    # Set up a lock for thread-safe printing
-    print_lock = threading.Lock()
-    
     # Record the start time for timestamps
     start_time = time.time()
     
+    # Recognized results are queued by the recognition callback and processed on
+    # a worker thread, so the Speech SDK callback never waits on parsing,
+    # printing or the speaker analyzer
+    result_queue = queue.Queue(maxsize=RESULT_QUEUE_SIZE)
+    
+    def process_final_result(result):
+        """Process a final recognition result taken from the result queue."""
+        # Use the speaker ID and text the SDK already exposes; the result JSON is
+        # only parsed when the speaker ID is missing
+        speaker_id = getattr(result, "speaker_id", None) or _extract_speaker_id(json.loads(result.json))
+        text = result.text
+        
+        # Get the timestamp
+        offset = result.offset / 10000000  # Convert from 100ns to seconds
+        timestamp = dt.fromtimestamp(start_time + offset).strftime("%H:%M:%S")
+        
+        # Check if this is a new speaker
+        if speaker_id not in speakers:
+            speakers[speaker_id] = f"Speaker {len(speakers) + 1}"
+            print(f"Detected new speaker: {speakers[speaker_id]} (ID: {speaker_id})")
+        
+        # Add the utterance to the transcription
+        line = f"[{timestamp}] {speakers[speaker_id]}: {text}"
+        transcription_lines.append(line)
+        if transcription_file:
+            transcription_file.write(line + "\n")
+        print(line)
+        
+        # Add the utterance to the speaker analyzer for role analysis
+        new_speaker_detected = speaker_analyzer.add_utterance(speaker_id, text)
+        if new_speaker_detected:
+            print(f"New speaker detected: {speaker_id}. Triggering speaker role analysis...")
+            speaker_analyzer.request_analysis(get_completion_func)
+    
+    def process_results():
+        """Process queued recognition results until the None sentinel arrives."""
+        while True:
+            result = result_queue.get()
+            if result is None:
+                break
+            try:
+                process_final_result(result)
+            except Exception as e:
+                print(f"Error processing recognition result: {str(e)}")
+    
+    result_worker = threading.Thread(target=process_results, daemon=True)
+    result_worker.start()
+    
     # Define callbacks for recognition events
     def handle_final_result(evt):
         """Handle final recognition result."""
         if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech:
-            # Get the result details
-            result_json = json.loads(evt.result.json)
-            
-            # Extract speaker ID - look for the speaker ID in different possible locations in the result
-            speaker_id = None
-            
-            # Try to get speaker ID from NBest results
-            if "NBest" in result_json and result_json["NBest"]:
-                for item in result_json["NBest"]:
-                    if "Speaker" in item and item["Speaker"]:
-                        speaker_id = str(item["Speaker"])
-                        break
-            
-            # If not found in NBest, try the top level
-            if not speaker_id and "Speaker" in result_json:
-                speaker_id = str(result_json["Speaker"])
-            
-            # If still not found, check for SpeakerId
-            if not speaker_id and "SpeakerId" in result_json:
-                speaker_id = str(result_json["SpeakerId"])
-            
-            # If still no speaker ID, use a default
-            if not speaker_id:
-                speaker_id = "Unknown"
-            
-            # Extract the recognized text
-            text = result_json.get("DisplayText", "")
-            
-            # Get the timestamp
-            offset = result_json.get("Offset", 0) / 10000000  # Convert from 100ns to seconds
-            timestamp = dt.fromtimestamp(start_time + offset).strftime("%H:%M:%S")
-            
-            # Use print_lock to ensure clean output
-            with print_lock:
-                # Check if this is a new speaker
-                if speaker_id not in speakers:
-                    speakers[speaker_id] = f"Speaker {len(speakers) + 1}"
-                    print(f"Detected new speaker: {speakers[speaker_id]} (ID: {speaker_id})")
-                
-                # Add the utterance to the transcription
-                line = f"[{timestamp}] {speakers[speaker_id]}: {text}"
-                transcription_lines.append(line)
-                print(line)
-            
-            # Add the utterance to the speaker analyzer for role analysis
-            new_speaker_detected = speaker_analyzer.add_utterance(speaker_id, text)
-            if new_speaker_detected:
-                with print_lock:
-                    print(f"New speaker detected: {speaker_id}. Triggering speaker role analysis...")
-                speaker_analyzer.analyze_with_llm(get_completion_func)
+            result_queue.put(evt.result)
         else:
-            with print_lock:
-                print(f"Recognition result was not successful: {evt.result.reason}")
+            print(f"Recognition result was not successful: {evt.result.reason}")
             
     def handle_canceled(evt):
         print(f"Speech recognition canceled: {evt.result.reason}")
@@ -581,16 +797,31 @@ def identify_speakers_from_audio(audio_file_path, timeout=60, output_dir=None):
     transcriber.canceled.connect(handle_canceled)
     transcriber.session_stopped.connect(handle_session_stopped)
     
-    # Start recognition
-    print("Starting recognition...")
-    transcriber.start_transcribing_async()
-    
-    # Wait for recognition to complete or timeout
-    print(f"Waiting for recognition to complete (timeout: {timeout} seconds)...")
-    done.wait(timeout=timeout)
+    # The transcription is written line by line as results arrive, so the file
+    # can be followed during long recordings
+    transcription_file = open(transcription_path, "w", encoding="utf-8", buffering=1) if transcription_path else None
+    try:
+        # Start recognition
+        print("Starting recognition...")
+        transcriber.start_transcribing_async()
+        
+        # Wait for recognition to complete or timeout
+        print(f"Waiting for recognition to complete (timeout: {timeout} seconds)...")
+        done.wait(timeout=timeout)
+        
+        # Stop recognition
+        transcriber.stop_transcribing_async().get()
+        
+    finally:
+        # Let the worker finish the results that are still queued
+        result_queue.put(None)
+        result_worker.join()
+        
+        if transcription_file:
+            transcription_file.close()
     
-    # Stop recognition
-    transcriber.stop_transcribing_async()
+    if transcription_file:
+        print(f"Transcription saved to: {transcription_path}")
     
     # Stop parallel analysis
     speaker_analyzer.stop_parallel_analysis()
@@ -601,12 +832,6 @@ def identify_speakers_from_audio(audio_file_path, timeout=60, output_dir=None):
     speaker_analyzer.analyze_with_llm(get_completion_func)
     print(f"Final analysis complete. Success: {bool(speaker_analyzer.roles)}")
     
-    # Save the transcription to a file if output_dir is provided
-    if transcription_path:
-        with open(transcription_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(transcription_lines))
-        print(f"Transcription saved to: {transcription_path}")
-    
     # Save the speaker information to a file if output_dir is provided
     if speakers_info_path:
         speaker_info = []
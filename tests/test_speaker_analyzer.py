@@ -0,0 +1,68 @@
+"""
+Tests for the caching and incremental prompts of SpeakerAnalyzer.
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+# Add the parent directory to the path so we can import from src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("azure.cognitiveservices.speech")
+
+from src import speaker_identification
+from src.speaker_identification import SpeakerAnalyzer
+
+class FakeCompletion:
+    """Completion function that records the prompts and classifies every speaker as a client."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, request):
+        self.prompts.append(request.prompt)
+        speaker_ids = [line[len("Speaker "):-1] for line in request.prompt.splitlines()
+                       if line.startswith("Speaker ") and line.endswith(":")]
+        return json.dumps({
+            "roles": {speaker_id: "client" for speaker_id in speaker_ids},
+            "confidence": {speaker_id: 0.9 for speaker_id in speaker_ids},
+            "reasoning": {speaker_id: "test" for speaker_id in speaker_ids}
+        })
+
+def test_unchanged_utterances_are_not_analyzed_again():
+    analyzer = SpeakerAnalyzer()
+    analyzer.add_utterance("1", "Hej, välkommen")
+    completion = FakeCompletion()
+
+    assert analyzer.analyze_with_llm(completion)
+    assert analyzer.analyze_with_llm(completion)
+    assert len(completion.prompts) == 1
+    assert analyzer.get_results()["roles"] == {"1": "client"}
+
+def test_only_new_utterances_are_sent_for_classified_speakers():
+    analyzer = SpeakerAnalyzer()
+    analyzer.add_utterance("1", "Första repliken")
+    completion = FakeCompletion()
+    analyzer.analyze_with_llm(completion)
+
+    analyzer.add_utterance("1", "Andra repliken")
+    analyzer.analyze_with_llm(completion)
+
+    assert len(completion.prompts) == 2
+    assert "Första repliken" not in completion.prompts[1]
+    assert "Andra repliken" in completion.prompts[1]
+    assert "Previously classified" in completion.prompts[1]
+
+def test_analysis_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(speaker_identification, "ANALYSIS_CACHE_SIZE", 2)
+    analyzer = SpeakerAnalyzer()
+    completion = FakeCompletion()
+    for i in range(4):
+        analyzer.add_utterance("1", f"Replik {i}")
+        analyzer.analyze_with_llm(completion)
+
+    assert len(completion.prompts) == 4
+    assert len(analyzer._cache) == 2
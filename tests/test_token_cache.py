@@ -0,0 +1,57 @@
+"""
+Tests for the access token cache in src.auth.
+"""
+
+import os
+import sys
+import time
+from collections import namedtuple
+
+import pytest
+
+# Add the parent directory to the path so we can import from src
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("azure.identity")
+pytest.importorskip("openai")
+
+from src import auth
+
+AccessToken = namedtuple("AccessToken", ["token", "expires_on"])
+
+class FakeCredential:
+    """Credential that issues numbered tokens and counts the requests."""
+
+    def __init__(self, name, lifetime=3600):
+        self.name = name
+        self.lifetime = lifetime
+        self.calls = 0
+
+    def get_token(self, scope):
+        self.calls += 1
+        return AccessToken(f"{self.name}-{scope}-{self.calls}", time.time() + self.lifetime)
+
+def test_token_is_reused_while_valid():
+    credential = FakeCredential("a")
+    first = auth.get_token(credential)
+    assert auth.get_token(credential) == first
+    assert credential.calls == 1
+
+def test_tokens_are_cached_per_credential():
+    first = FakeCredential("first")
+    second = FakeCredential("second")
+    assert auth.get_token(first).startswith("first-")
+    assert auth.get_token(second).startswith("second-")
+    assert (first.calls, second.calls) == (1, 1)
+
+def test_tokens_are_cached_per_scope():
+    credential = FakeCredential("a")
+    auth.get_token(credential, "scope-1")
+    auth.get_token(credential, "scope-2")
+    assert credential.calls == 2
+
+def test_token_is_refreshed_within_the_margin():
+    credential = FakeCredential("a", lifetime=auth.TOKEN_REFRESH_MARGIN - 1)
+    first = auth.get_token(credential)
+    assert auth.get_token(credential) != first
+    assert credential.calls == 2
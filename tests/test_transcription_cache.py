@@ -0,0 +1,82 @@
+"""
+Tests for the shared transcription helpers of the WAV test scripts.
+"""
+
+import os
+import sys
+import json
+
+import pytest
+
+# The scripts import their shared modules by bare name
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import _transcription
+from _transcription import (
+    SpeakerResolver, TranscriptionRecorder, load_speaker_info, transcription_cache_path,
+    load_cached_transcription, save_cached_transcription
+)
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Point the transcription cache at a temporary directory."""
+    directory = tmp_path / "cache"
+    monkeypatch.setattr(_transcription, "TRANSCRIPTION_CACHE_DIR", str(directory))
+    return directory
+
+@pytest.fixture
+def speakers_file(tmp_path):
+    """Write a speakers file with an advisor and a client."""
+    path = tmp_path / "speakers.json"
+    path.write_text(json.dumps({
+        "speakers": [
+            {"name": "Maria", "voice": "sv-SE-SofieNeural", "role": "advisor"},
+            {"name": "Erik", "voice": "sv-SE-MattiasNeural", "role": "client"}
+        ]
+    }), encoding="utf-8")
+    load_speaker_info.cache_clear()
+    return str(path)
+
+def test_cache_round_trip(tmp_path, cache_dir, speakers_file):
+    wav_file = tmp_path / "meeting.wav"
+    wav_file.write_bytes(b"RIFF audio")
+
+    recorder = TranscriptionRecorder()
+    recorder.add_result("Hej Erik", "sv-SE-SofieNeural", "Maria", "advisor", "ADVISOR")
+    result = recorder.build_result()
+
+    cache_path = transcription_cache_path(str(wav_file), speakers_file, "batch")
+    assert load_cached_transcription(cache_path) is None
+    save_cached_transcription(cache_path, result)
+
+    transcription_file = tmp_path / "transcription.txt"
+    cached = load_cached_transcription(cache_path, str(transcription_file))
+    assert cached["transcription_lines"] == result["transcription_lines"]
+    assert cached["speakers"] == {"sv-SE-SofieNeural": "Maria"}
+    assert cached["transcription_file"] == str(transcription_file)
+    assert transcription_file.read_text(encoding="utf-8") == "Maria (ADVISOR): Hej Erik"
+
+def test_cache_path_depends_on_inputs_and_prefix(tmp_path, cache_dir, speakers_file):
+    wav_file = tmp_path / "meeting.wav"
+    wav_file.write_bytes(b"RIFF audio")
+    path = transcription_cache_path(str(wav_file), speakers_file, "batch")
+
+    assert path.startswith(str(cache_dir))
+    assert transcription_cache_path(str(wav_file), speakers_file, "continuous") != path
+
+    wav_file.write_bytes(b"RIFF other audio")
+    assert transcription_cache_path(str(wav_file), speakers_file, "batch") != path
+
+def test_label_is_bound_after_repeated_matches(speakers_file):
+    resolver = SpeakerResolver(speakers_file)
+
+    # Addressing someone by name once only affects that utterance
+    assert resolver.resolve("Guest-1", "Tack Erik")[1] == "Erik"
+    assert resolver.resolve("Guest-1", "Det låter bra")[1] == "Unknown Speaker"
+
+    # Matching the same name LEARN_VOICE_MIN_MATCHES times in a row binds the label
+    for _ in range(_transcription.LEARN_VOICE_MIN_MATCHES):
+        resolver.resolve("Guest-2", "Maria här")
+    assert resolver.resolve("Guest-2", "Det låter bra") == (
+        "sv-SE-SofieNeural", "Maria", "advisor", "ADVISOR"
+    )